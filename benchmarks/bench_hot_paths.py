@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks: CPU-side code in services.py that runs on every request
+
+Each case is timed at several transcript lengths. Every case is warmed up
+first. It is then timed in --repeat rounds, each long enough to give a stable
+number (timeit's autorange), and the per-call median, min and relative stdev
+are reported.
+
+Transcript and analysis cases come in two forms: "warm" reuses the session's
+memoized conversation stats, as the app does after the session's messages
+went through this worker, and "cold" rebuilds them from the transcript on
+every call.
+
+--save writes the results to a baseline file. --baseline compares against
+one and exits with status 1 if any case is more than --threshold slower.
+The comparison uses the fastest round, which is the least sensitive to
+noise from the rest of the machine:
+
+    python benchmarks/bench_hot_paths.py --save benchmarks/hot_paths_baseline.json
+    python benchmarks/bench_hot_paths.py --baseline benchmarks/hot_paths_baseline.json --threshold 0.2
+
+Baselines are machine specific; compare runs from the same machine.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import timeit
+import uuid
+from datetime import datetime, timedelta, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The services only need a storage backend object, never a live one
+os.environ.setdefault('STORAGE_BACKEND', 'sqlite')
+os.environ.setdefault('SQLITE_PATH', ':memory:')
+os.environ.setdefault('OPENAI_API_KEY', 'benchmark-key')
+sys.path.insert(0, ROOT)
+
+from fake_openai import FEEDBACK_REPLY
+from models import SessionWithMessages, Situation
+from services import AIPersonaService, FeedbackService, conversation_stats
+
+USER_LINES = [
+    "I worked on a Python project where our team rebuilt the billing service, and I led the API design.",
+    "Honestly I'm frustrated, this is the third time the order arrived late and I want a refund.",
+    "I appreciate the feedback. I understand the deadlines slipped and I'd like to improve how we plan.",
+    "I love hiking and photography, and last year I took a trip to Japan that I still talk about.",
+    "Our company is looking for partners in the industry, maybe we could work together on something.",
+    "What does a typical day look like for the team, and how do you measure success in this role?"
+]
+PERSONA_LINES = [
+    "That's interesting. Can you walk me through how you approached that?",
+    "I understand, and I'm sorry about the trouble. Let me see what I can do for you.",
+    "Thanks for being open about it. What do you think got in the way?",
+    "That sounds amazing! What was the highlight of the trip for you?"
+]
+
+def make_situation(category: str = 'career') -> Situation:
+    return Situation(
+        id=1, title='Job Interview - Software Developer',
+        description='Practice answering common technical and behavioral questions.',
+        persona_script='You are Sarah Chen, a Senior Engineering Manager interviewing a candidate.',
+        difficulty_level='intermediate', category=category,
+        created_at=datetime(2025, 1, 1, tzinfo=timezone.utc), is_active=True
+    )
+
+def make_session_payload(length: int) -> dict:
+    """A session_details row as the storage layer returns it"""
+    session_id = str(uuid.uuid4())
+    started = datetime(2025, 1, 1, 12, tzinfo=timezone.utc)
+    situation = make_situation()
+    return {
+        'id': session_id, 'user_id': str(uuid.uuid4()), 'situation_id': 1,
+        'started_at': started.isoformat(), 'ended_at': None, 'status': 'active',
+        'session_duration': 0, 'next_message_order': length,
+        'situation': situation.model_dump(mode='json'),
+        'messages': [{
+            'id': str(uuid.uuid4()), 'session_id': session_id,
+            'message_type': 'persona' if i % 2 == 0 else 'user',
+            'content': (PERSONA_LINES if i % 2 == 0 else USER_LINES)[i % 4],
+            'timestamp': (started + timedelta(seconds=20 * i)).isoformat(), 'message_order': i
+        } for i in range(length)],
+        'summary': None
+    }
+
+def build_cases(ai: AIPersonaService, feedback: FeedbackService):
+    """name -> factory(length) returning the zero-argument callable to time"""
+    def session(length):
+        return SessionWithMessages(**make_session_payload(length))
+
+    def mock_engine(category):
+        def factory(length):
+            situation = make_situation(category)
+            message = ' '.join(USER_LINES[i % len(USER_LINES)] for i in range(max(1, length // 10)))
+            return lambda: ai._generate_enhanced_contextual_response(situation, message, length)
+        return factory
+
+    def cold(method):
+        """Drop the session's memoized conversation stats before every call, as on a worker that never saw it"""
+        def factory(length):
+            s = session(length)
+            def run():
+                conversation_stats.evict(str(s.id))
+                return method(s)
+            return run
+        return factory
+
+    cases = {
+        'build_conversation_context': lambda n: (lambda s=session(n): ai._build_conversation_context(s.situation, s.messages)),
+        'create_system_prompt': lambda n: (lambda s=make_situation(): ai._create_system_prompt(s)),
+        'compile_system_prompt': lambda n: (lambda s=make_situation(): ai._compile_system_prompt(s)),
+        'build_transcript_warm': lambda n: (lambda s=session(n): feedback._build_transcript(s)),
+        'build_transcript_cold': cold(feedback._build_transcript),
+        'parse_ai_feedback': lambda n: (lambda s=session(n): feedback._parse_ai_feedback(FEEDBACK_REPLY, s)),
+        'analyze_conversation_warm': lambda n: (lambda s=session(n): feedback._analyze_conversation(s)),
+        'analyze_conversation_cold': cold(feedback._analyze_conversation),
+        'session_with_messages': lambda n: (lambda p=make_session_payload(n): SessionWithMessages(**p))
+    }
+    for category in ('career', 'customer_service', 'social', 'management', 'networking'):
+        cases[f'mock_engine_{category}'] = mock_engine(category)
+    return cases
+
+def measure(func, repeat: int, warmup: float) -> dict:
+    """Per-call timings in microseconds over `repeat` autoranged rounds"""
+    # The persona engine picks replies with random.choice; reseeding per round keeps
+    # every round on the same branches
+    timer = timeit.Timer(func, setup=lambda: random.seed(7))
+    # Warm-up: run for at least `warmup` seconds so caches and allocators settle
+    number, elapsed = timer.autorange()
+    while elapsed < warmup:
+        elapsed += timer.timeit(number)
+    rounds = [t / number * 1e6 for t in timer.repeat(repeat=repeat, number=number)]
+    median = statistics.median(rounds)
+    return {
+        'median_us': round(median, 3),
+        'min_us': round(min(rounds), 3),
+        'rel_stdev': round(statistics.stdev(rounds) / median, 4) if len(rounds) > 1 and median else 0.0,
+        'calls_per_round': number
+    }
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--lengths', type=int, nargs='+', default=[10, 50, 200], help='transcript lengths')
+    parser.add_argument('--repeat', type=int, default=9)
+    parser.add_argument('--warmup', type=float, default=0.2, help='warm-up seconds per case')
+    parser.add_argument('--filter', default='', help='only run cases whose name contains this')
+    parser.add_argument('--save', help='write results as a baseline file')
+    parser.add_argument('--baseline', help='baseline file to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2, help='allowed fractional slowdown per case')
+    return parser.parse_args()
+
+def main() -> None:
+    args = parse_args()
+    ai, feedback = AIPersonaService(), FeedbackService()
+    cases = build_cases(ai, feedback)
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['cases']
+
+    results, regressions = {}, []
+    print(f'{"case":<42} {"median":>11} {"min":>11} {"stdev":>7} {"vs base":>8}')
+    for name, factory in cases.items():
+        if args.filter not in name:
+            continue
+        for length in args.lengths:
+            key = f'{name}[{length}]'
+            results[key] = stats = measure(factory(length), args.repeat, args.warmup)
+            change = ''
+            if key in baseline:
+                ratio = stats['min_us'] / baseline[key]['min_us'] - 1
+                change = f'{ratio:+.1%}'
+                if ratio > args.threshold:
+                    regressions.append(f"{key}: {baseline[key]['min_us']:.2f}us -> {stats['min_us']:.2f}us ({change})")
+            print(f"{key:<42} {stats['median_us']:>9.2f}us {stats['min_us']:>9.2f}us "
+                  f"{stats['rel_stdev']:>6.1%} {change:>8}")
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({'python': platform.python_version(), 'machine': platform.machine(), 'cases': results},
+                      f, indent=2, sort_keys=True)
+        print(f'Baseline written to {args.save}')
+
+    if regressions:
+        print(f'Regressions beyond {args.threshold:.0%}:')
+        for regression in regressions:
+            print(f'  {regression}')
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
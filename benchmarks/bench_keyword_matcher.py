@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: rule-based persona engine keyword scanning
+
+Compares, per message, the original engine (separate `keyword in text` scans
+for topics, sentiment and each handler's keyword group) against the shared
+KeywordMatcher now used by AIPersonaService, which returns every keyword hit
+at once. Both are checked to agree on every generated message before timing.
+
+"warm" reuses one matcher, as the app does; "cold" clears the matcher's memo
+before every message, so every chunk of text goes through the compiled trie
+regex.
+
+Usage:
+    python benchmarks/bench_keyword_matcher.py --lengths 100 1000 10000
+"""
+
+import argparse
+import os
+import random
+import sys
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# services only needs a storage backend object at import, never a live one
+os.environ.setdefault('STORAGE_BACKEND', 'sqlite')
+os.environ.setdefault('SQLITE_PATH', ':memory:')
+os.environ.setdefault('OPENAI_API_KEY', 'benchmark-key')
+sys.path.insert(0, ROOT)
+
+from keywords import KeywordMatcher
+from services import KEYWORD_GROUPS, TOPIC_KEYWORDS
+
+HANDLER_GROUPS = [sorted(group) for name, group in KEYWORD_GROUPS.items() if name not in ('positive', 'negative')]
+POSITIVE = sorted(KEYWORD_GROUPS['positive'])
+NEGATIVE = sorted(KEYWORD_GROUPS['negative'])
+TOPICS = list(TOPIC_KEYWORDS)
+ALL_KEYWORDS = [keyword for group in KEYWORD_GROUPS.values() for keyword in sorted(group)] + TOPICS
+
+FILLER = ('the', 'and', 'then', 'we', 'really', 'with', 'about', 'because', 'thing',
+          'people', 'while', 'wonder', 'workshop', 'hobbyist', 'rapid', 'conversation',
+          'interview', 'answer', 'question', 'yesterday', 'tomorrow', 'meeting', 'i',
+          'think', 'that', 'was', 'a', 'time', 'when', 'it', 'is', 'my', 'to', 'so')
+
+def make_message(length: int, rng: random.Random, density: float) -> str:
+    words = []
+    size = 0
+    while size < length:
+        word = rng.choice(ALL_KEYWORDS) if rng.random() < density else rng.choice(FILLER)
+        words.append(word + rng.choice(('', '', '', ',', '.', '?')))
+        size += len(words[-1]) + 1
+    return ' '.join(words)[:length]
+
+def original_engine(text: str) -> list:
+    """The scans the engine used to run per message: topics, sentiment, then each handler group"""
+    topics = [keyword for keyword in TOPICS if keyword in text][:3]
+    positive = sum(1 for word in POSITIVE if word in text)
+    negative = sum(1 for word in NEGATIVE if word in text)
+    matched = [any(word in text for word in group) for group in HANDLER_GROUPS]
+    return [topics, positive, negative, matched]
+
+def substring_hits(text: str) -> set:
+    return {keyword for keyword in ALL_KEYWORDS if keyword in text}
+
+def per_message_us(func, messages, number: int) -> float:
+    elapsed = min(timeit.repeat(lambda: [func(m) for m in messages], number=number, repeat=5))
+    return elapsed / (number * len(messages)) * 1e6
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--lengths', type=int, nargs='+', default=[100, 300, 1000, 10000])
+    parser.add_argument('--messages', type=int, default=50)
+    parser.add_argument('--density', type=float, default=0.03, help='fraction of words that are keywords')
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    matcher = KeywordMatcher(ALL_KEYWORDS)
+
+    print(f'{"chars":>7} {"original":>12} {"warm":>12} {"cold":>12} {"speedup":>8}')
+    for length in args.lengths:
+        messages = [make_message(length, rng, args.density) for _ in range(args.messages)]
+        for message in messages:
+            assert matcher.find(message) == substring_hits(message), 'matcher disagrees with substring scans'
+
+        number = max(1, 20000 // length)
+        before = per_message_us(original_engine, messages, number)
+        warm = per_message_us(matcher.find, messages, number)
+        cold = per_message_us(lambda m: (matcher._chunk_hits.cache_clear(), matcher.find(m)), messages, number)
+        print(f'{length:>7} {before:>9.1f} us {warm:>9.1f} us {cold:>9.1f} us {before / warm:>7.1f}x')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Benchmark: send_message throughput, blocking Supabase client vs async data layer
+
+Starts a local PostgREST stand-in that answers every request after a fixed
+latency, then runs N concurrent users through chat turns:
+
+- before: the original send_message query sequence issued through the
+  synchronous Supabase client, i.e. blocking HTTP calls on the event loop
+- after:  the real `main.send_message` route, whose services await the pooled
+  async client from database.py
+
+The LLM call is replaced by a fixed asyncio.sleep in both modes so the
+numbers reflect the data layer only.
+
+Usage:
+    python benchmarks/bench_send_message.py --users 100 --turns 3
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import socket
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+USER_ID = str(uuid.uuid4())
+USER_UUID = str(uuid.uuid4())
+SITUATION = {
+    'id': 1,
+    'title': 'Job Interview',
+    'description': 'Practice a software engineering interview',
+    'persona_script': 'You are a friendly hiring manager.',
+    'difficulty_level': 'beginner',
+    'category': 'career',
+    'created_at': '2025-01-01T00:00:00+00:00',
+    'is_active': True
+}
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def build_stub_app(latency: float, transcript_length: int):
+    """PostgREST stand-in: fixed latency, canned rows per table"""
+    from starlette.applications import Starlette
+    from starlette.responses import JSONResponse
+    from starlette.routing import Route
+
+    # next_message_order per session, seeded with the canned transcript length
+    counters = {}
+
+    def session_row(session_id: str) -> dict:
+        return {
+            'id': session_id, 'user_id': USER_ID, 'situation_id': 1,
+            'started_at': _now(), 'ended_at': None, 'status': 'active',
+            'session_duration': 0,
+            'next_message_order': counters.setdefault(session_id, transcript_length)
+        }
+
+    def message_rows(session_id: str) -> list:
+        return [{
+            'id': str(uuid.uuid4()), 'session_id': session_id,
+            'message_type': 'user' if i % 2 else 'persona',
+            'content': f'Message number {i} in this conversation.',
+            'timestamp': _now(), 'message_order': i
+        } for i in range(counters.setdefault(session_id, transcript_length))]
+
+    def rows_for(table: str, params) -> list:
+        session_id = (params.get('id') or params.get('session_id') or 'eq.' + str(uuid.uuid4()))[3:]
+        if table == 'users':
+            return [{'id': USER_ID, 'session_uuid': USER_UUID, 'created_at': _now(), 'last_active': _now()}]
+        if table == 'situations':
+            return [SITUATION]
+        if table == 'roleplay_sessions':
+            return [session_row(session_id)]
+        if table == 'dialogue_messages':
+            return message_rows(session_id)
+        if table == 'session_details':
+            return [{**session_row(session_id), 'situation': SITUATION,
+                     'messages': message_rows(session_id), 'summary': None}]
+        return []
+
+    def fill(table: str, row: dict) -> dict:
+        row = {'id': str(uuid.uuid4()), **row}
+        if table == 'dialogue_messages':
+            row.setdefault('timestamp', _now())
+        return row
+
+    async def handle(request):
+        await asyncio.sleep(latency)
+        table = request.path_params['path'].rstrip('/').split('/')[-1]
+        if table == 'append_dialogue_message':
+            body = await request.json()
+            session_id = body['p_session_id']
+            message_order = counters.setdefault(session_id, transcript_length)
+            counters[session_id] = message_order + 1
+            return JSONResponse([fill('dialogue_messages', {
+                'session_id': session_id, 'message_type': body['p_message_type'],
+                'content': body['p_content'], 'message_order': message_order
+            })])
+        if table == 'append_opening_message':
+            body = await request.json()
+            session_id = body['p_session_id']
+            if counters.setdefault(session_id, transcript_length) != 0:
+                return JSONResponse([])
+            counters[session_id] = 1
+            return JSONResponse([fill('dialogue_messages', {
+                'session_id': session_id, 'message_type': 'persona',
+                'content': body['p_content'], 'message_order': 0
+            })])
+        if request.method == 'POST':
+            body = await request.json()
+            rows = [fill(table, row) for row in (body if isinstance(body, list) else [body])]
+            return JSONResponse(rows, status_code=201)
+        rows = rows_for(table, request.query_params)
+        if request.method == 'PATCH':
+            return JSONResponse(rows)
+        if 'vnd.pgrst.object' in request.headers.get('accept', ''):
+            if not rows:
+                return JSONResponse({
+                    'message': 'JSON object requested, multiple (or no) rows returned',
+                    'details': 'The result contains 0 rows', 'hint': None, 'code': 'PGRST116'
+                }, status_code=406)
+            return JSONResponse(rows[0])
+        return JSONResponse(rows, headers={'Content-Range': f'0-{max(len(rows) - 1, 0)}/{len(rows)}'})
+
+    methods = ['GET', 'POST', 'PATCH', 'DELETE']
+    return Starlette(routes=[Route('/{path:path}', handle, methods=methods)])
+
+def _serve_stub(port: int, latency: float, transcript_length: int) -> None:
+    import uvicorn
+
+    uvicorn.run(build_stub_app(latency, transcript_length), host='127.0.0.1', port=port, log_level='warning')
+
+def start_stub_server(latency: float, transcript_length: int) -> str:
+    """Run the stand-in in its own process so it does not share our GIL"""
+    port = _free_port()
+    process = multiprocessing.Process(target=_serve_stub, args=(port, latency, transcript_length), daemon=True)
+    process.start()
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.1).close()
+            break
+        except OSError:
+            time.sleep(0.05)
+    return f'http://127.0.0.1:{port}'
+
+def configure_environment(base_url: str) -> None:
+    """Point config.py at the stand-in before any app module is imported"""
+    os.environ['SUPABASE_URL'] = base_url
+    os.environ['SUPABASE_REST_URL'] = f'{base_url}/rest/v1'
+    os.environ.setdefault('SUPABASE_ANON_KEY', 'benchmark.anon.key')
+    os.environ.setdefault('OPENAI_API_KEY', 'benchmark-key')
+    os.chdir(ROOT)
+    sys.path.insert(0, ROOT)
+
+async def blocking_turn(session_id: str, message: str, llm_latency: float) -> None:
+    """The pre-async send_message query sequence on the sync client"""
+    from database import get_supabase_client
+
+    supabase = get_supabase_client()
+    supabase.table('users').select('*').eq('session_uuid', USER_UUID).maybe_single().execute()
+    supabase.table('users').update({'last_active': _now()}).eq('session_uuid', USER_UUID).execute()
+    supabase.table('roleplay_sessions').select('*').eq('id', session_id).maybe_single().execute()
+    supabase.table('situations').select('*').eq('id', 1).maybe_single().execute()
+    supabase.table('dialogue_messages').select('*').eq('session_id', session_id).order('message_order').execute()
+    supabase.table('session_summaries').select('*').eq('session_id', session_id).maybe_single().execute()
+    for message_type in ('user', 'persona'):
+        supabase.table('dialogue_messages').select('id', count='exact').eq('session_id', session_id).execute()
+        supabase.table('dialogue_messages').insert({
+            'session_id': session_id, 'message_type': message_type,
+            'content': message, 'message_order': 0, 'timestamp': _now()
+        }).execute()
+        if message_type == 'user':
+            supabase.table('users').update({'last_active': _now()}).eq('id', USER_ID).execute()
+            supabase.table('dialogue_messages').select('*').eq('session_id', session_id).order('message_order').execute()
+            await asyncio.sleep(llm_latency)
+
+async def async_turn(session_id: str, message: str, llm_latency: float) -> None:
+    """One turn through the real route"""
+    import main
+
+    response = await main.send_message(session_id, message=message, user_uuid=USER_UUID)
+    if response.status_code != 200:
+        raise RuntimeError(f'send_message failed: {response.body!r}')
+
+async def run_mode(turn, users: int, turns: int, llm_latency: float) -> float:
+    async def user_loop():
+        session_id = str(uuid.uuid4())
+        for i in range(turns):
+            await turn(session_id, f'Benchmark message {i}', llm_latency)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(user_loop() for _ in range(users)))
+    elapsed = time.perf_counter() - started
+    return users * turns / elapsed
+
+async def main_async(args) -> None:
+    import main
+
+    async def fake_llm(situation, history):
+        await asyncio.sleep(args.llm_latency_ms / 1000)
+        return 'Thanks for sharing that. Can you tell me more about your experience?'
+
+    main.ai_service.generate_response = fake_llm
+    llm_latency = args.llm_latency_ms / 1000
+
+    # Warm up connections on both clients
+    await run_mode(blocking_turn, 1, 1, 0)
+    await run_mode(async_turn, 1, 1, 0)
+
+    before = await run_mode(blocking_turn, args.users, args.turns, llm_latency)
+    after = await run_mode(async_turn, args.users, args.turns, llm_latency)
+
+    print(f'send_message, {args.users} concurrent users x {args.turns} turns, '
+          f'db latency {args.db_latency_ms}ms, llm latency {args.llm_latency_ms}ms')
+    print(f'  before (blocking sync client): {before:8.1f} req/s')
+    print(f'  after  (async pooled client):  {after:8.1f} req/s')
+    print(f'  speedup: {after / before:.1f}x')
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--turns', type=int, default=3)
+    parser.add_argument('--db-latency-ms', type=float, default=20)
+    parser.add_argument('--llm-latency-ms', type=float, default=300)
+    parser.add_argument('--transcript-length', type=int, default=10)
+    return parser.parse_args()
+
+if __name__ == '__main__':
+    args = parse_args()
+    base_url = start_stub_server(args.db_latency_ms / 1000, args.transcript_length)
+    configure_environment(base_url)
+    asyncio.run(main_async(args))
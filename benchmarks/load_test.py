@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+Load test: the full chat journey against the real app, with local stand-ins
+
+Starts fake_openai.py and the app (uvicorn main:app with the SQLite storage
+backend) as separate processes, then runs --users concurrent virtual users
+through the journey:
+
+    home -> start-session -> chat page -> opening -> N messages -> end -> feedback
+    (polling its status until ready) -> history
+
+Reports throughput plus p50/p95/p99 latency per route and writes the results
+to a JSON file. With --baseline, routes whose p95 grew or whose throughput
+dropped by more than --threshold are reported as regressions and the script
+exits with status 1, so it can gate a deploy:
+
+    python benchmarks/load_test.py --users 50 --messages 5 --output load.json
+    python benchmarks/load_test.py --users 50 --messages 5 --baseline load.json
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+USER_UUID_INPUT = re.compile(r'name="user_uuid" value="([0-9a-f-]{36})"')
+MESSAGES = [
+    "Hi, thanks for having me. I've been looking forward to this conversation.",
+    "I worked on a project where our team had to migrate a large Python service with no downtime.",
+    "I understand the concern, and I appreciate you being direct about it. Here's what I'd suggest.",
+    "The hardest part was coordinating with colleagues across three time zones, but we made it work.",
+    "What would success look like for you six months from now?",
+    "That makes sense. I'd be happy to follow up with more details after this."
+]
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def _wait_for(url: str, timeout: float = 30) -> None:
+    import httpx
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url, timeout=1).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError(f'{url} did not come up within {timeout}s')
+
+def start_stand_ins(args, database: str) -> List[subprocess.Popen]:
+    """Launch fake_openai.py and the app; returns the processes and sets args.base_url"""
+    llm_port, app_port = _free_port(), _free_port()
+    llm = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, 'fake_openai.py'), '--port', str(llm_port),
+         '--latency', args.llm_latency, '--seed', str(args.seed)],
+        cwd=ROOT
+    )
+    env = {
+        **os.environ,
+        'STORAGE_BACKEND': 'sqlite',
+        'SQLITE_PATH': database,
+        'OPENAI_BASE_URL': f'http://127.0.0.1:{llm_port}/v1',
+        'LLM_CASSETTE_MODE': 'passthrough'
+    }
+    app = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'main:app', '--host', '127.0.0.1', '--port', str(app_port),
+         '--workers', str(args.workers), '--log-level', 'warning', '--no-access-log'],
+        cwd=ROOT, env=env, stdout=None if args.verbose else subprocess.DEVNULL
+    )
+    processes = [llm, app]
+    try:
+        _wait_for(f'http://127.0.0.1:{llm_port}/stats')
+        _wait_for(f'http://127.0.0.1:{app_port}/health')
+    except Exception:
+        stop(processes)
+        raise
+    args.base_url = f'http://127.0.0.1:{app_port}'
+    return processes
+
+def stop(processes: List[subprocess.Popen]) -> None:
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+class Recorder:
+    """Latency samples and error counts per route"""
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.enabled = True
+
+    async def request(self, client, route: str, method: str, url: str, ok=(200,), **kwargs):
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except Exception:
+            if self.enabled:
+                self.errors[route] += 1
+            return None
+        if self.enabled:
+            self.samples[route].append(time.perf_counter() - started)
+            if response.status_code not in ok:
+                self.errors[route] += 1
+        return response
+
+async def journey(client, recorder: Recorder, messages: int) -> bool:
+    """One user session end to end; returns False if a step failed and the journey stopped early"""
+    response = await recorder.request(client, 'GET /', 'GET', '/')
+    match = USER_UUID_INPUT.search(response.text) if response is not None else None
+    if not match:
+        return False
+    user_uuid = match.group(1)
+
+    response = await recorder.request(client, 'POST /start-session', 'POST', '/start-session', ok=(303,),
+                                      data={'situation_id': 1, 'user_uuid': user_uuid})
+    if response is None or response.status_code != 303:
+        return False
+    session_id = response.headers['location'].split('/')[2].split('?')[0]
+    params = {'user_uuid': user_uuid}
+
+    await recorder.request(client, 'GET /session/{id}', 'GET', f'/session/{session_id}', params=params)
+    await recorder.request(client, 'GET /session/{id}/opening', 'GET', f'/session/{session_id}/opening', params=params)
+    for i in range(messages):
+        await recorder.request(client, 'POST /session/{id}/message', 'POST', f'/session/{session_id}/message',
+                               data={'message': MESSAGES[i % len(MESSAGES)], 'user_uuid': user_uuid})
+    await recorder.request(client, 'POST /session/{id}/end', 'POST', f'/session/{session_id}/end', data=params)
+    await recorder.request(client, 'GET /session/{id}/feedback', 'GET', f'/session/{session_id}/feedback', params=params)
+    # Feedback is generated in the background; poll like feedback.html does
+    for _ in range(120):
+        response = await recorder.request(client, 'GET /session/{id}/feedback/status', 'GET',
+                                          f'/session/{session_id}/feedback/status', params=params)
+        if response is None or response.status_code != 200 or response.json().get('ready'):
+            break
+        await asyncio.sleep(0.5)
+    await recorder.request(client, 'GET /history', 'GET', '/history', params=params)
+    return True
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    return sorted_values[max(0, math.ceil(fraction * len(sorted_values)) - 1)]
+
+def summarize(recorder: Recorder, elapsed: float) -> Dict[str, Dict[str, float]]:
+    routes = {}
+    for route in sorted(set(recorder.samples) | set(recorder.errors)):
+        values = sorted(recorder.samples.get(route, [])) or [0.0]
+        count = len(recorder.samples.get(route, []))
+        routes[route] = {
+            'count': count,
+            'errors': recorder.errors.get(route, 0),
+            'throughput_rps': round(count / elapsed, 2),
+            'mean_ms': round(sum(values) / len(values) * 1000, 2),
+            'p50_ms': round(percentile(values, 0.50) * 1000, 2),
+            'p95_ms': round(percentile(values, 0.95) * 1000, 2),
+            'p99_ms': round(percentile(values, 0.99) * 1000, 2),
+            'max_ms': round(values[-1] * 1000, 2)
+        }
+    return routes
+
+def compare(results: dict, baseline: dict, threshold: float) -> List[str]:
+    """Routes whose p95 rose or throughput fell by more than `threshold` against the baseline"""
+    regressions = []
+    for route, current in results['routes'].items():
+        before = baseline.get('routes', {}).get(route)
+        if not before or not before['count']:
+            continue
+        if current['p95_ms'] > before['p95_ms'] * (1 + threshold):
+            regressions.append(f"{route}: p95 {before['p95_ms']:.1f}ms -> {current['p95_ms']:.1f}ms")
+        if current['throughput_rps'] < before['throughput_rps'] * (1 - threshold):
+            regressions.append(f"{route}: throughput {before['throughput_rps']:.1f} -> {current['throughput_rps']:.1f} req/s")
+        if current['errors'] > before['errors']:
+            regressions.append(f"{route}: errors {before['errors']} -> {current['errors']}")
+    return regressions
+
+async def run(args) -> dict:
+    import httpx
+
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=args.users, max_keepalive_connections=args.users)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=args.timeout) as client:
+        recorder.enabled = False
+        await asyncio.gather(*(journey(client, recorder, args.messages) for _ in range(min(args.users, args.warmup))))
+        recorder.enabled = True
+
+        async def user_loop():
+            return sum([await journey(client, recorder, args.messages) for _ in range(args.sessions)])
+
+        started = time.perf_counter()
+        completed = sum(await asyncio.gather(*(user_loop() for _ in range(args.users))))
+        elapsed = time.perf_counter() - started
+
+    return {
+        'config': {
+            'users': args.users, 'sessions_per_user': args.sessions, 'messages': args.messages,
+            'workers': args.workers, 'llm_latency': args.llm_latency, 'seed': args.seed,
+            'python': platform.python_version(), 'machine': platform.machine()
+        },
+        'elapsed_s': round(elapsed, 3),
+        'journeys_completed': completed,
+        'journeys_per_second': round(completed / elapsed, 2),
+        'routes': summarize(recorder, elapsed)
+    }
+
+def print_report(results: dict) -> None:
+    config = results['config']
+    print(f"{config['users']} users x {config['sessions_per_user']} sessions x {config['messages']} messages, "
+          f"{config['workers']} worker(s), llm latency {config['llm_latency']}")
+    print(f"{results['journeys_completed']} journeys in {results['elapsed_s']:.1f}s "
+          f"({results['journeys_per_second']:.2f}/s)")
+    print(f'{"route":<34} {"count":>6} {"err":>4} {"req/s":>8} {"p50":>9} {"p95":>9} {"p99":>9}')
+    for route, stats in results['routes'].items():
+        print(f"{route:<34} {stats['count']:>6} {stats['errors']:>4} {stats['throughput_rps']:>8.1f} "
+              f"{stats['p50_ms']:>7.1f}ms {stats['p95_ms']:>7.1f}ms {stats['p99_ms']:>7.1f}ms")
+
+def parse_args(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=20, help='concurrent virtual users')
+    parser.add_argument('--sessions', type=int, default=1, help='journeys per user')
+    parser.add_argument('--messages', type=int, default=5, help='chat messages per journey')
+    parser.add_argument('--warmup', type=int, default=2, help='unrecorded journeys run first')
+    parser.add_argument('--workers', type=int, default=1, help='uvicorn worker processes')
+    parser.add_argument('--llm-latency', default='lognormal:400,0.4', help='fake_openai.py latency spec')
+    parser.add_argument('--timeout', type=float, default=60)
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--output', default='load_test_results.json')
+    parser.add_argument('--baseline', help='previous results file to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2, help='allowed fractional regression')
+    parser.add_argument('--verbose', action='store_true', help='show app output')
+    return parser.parse_args(argv)
+
+def main() -> None:
+    args = parse_args()
+    with tempfile.TemporaryDirectory() as workdir:
+        processes = start_stand_ins(args, os.path.join(workdir, 'load_test.sqlite3'))
+        try:
+            results = asyncio.run(run(args))
+        finally:
+            stop(processes)
+
+    print_report(results)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+    print(f'Results written to {args.output}')
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            print(f'Regressions beyond {args.threshold:.0%}:')
+            for regression in regressions:
+                print(f'  {regression}')
+            sys.exit(1)
+        print(f'No regressions beyond {args.threshold:.0%} against {args.baseline}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+class TTLCache:
+    """In-process LRU cache whose entries also expire after `ttl` seconds
+
+    Not thread-safe: instances are meant to be shared by coroutines running on
+    one event loop, which is how every uvicorn worker runs the app.
+    """
+
+    def __init__(self, maxsize: int, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, tuple[Any, Optional[float]]]" = OrderedDict()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value and mark it most recently used"""
+        item = self._data.get(key)
+        if item is None:
+            self.misses += 1
+            return default
+        value, expires_at = item
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Store a value, evicting the least recently used entries past maxsize"""
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        self._data[key] = (value, expires_at)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        item = self._data.pop(key, None)
+        return item[0] if item is not None else default
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {'size': len(self._data), 'hits': self.hits, 'misses': self.misses}
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+class SizedLRUCache:
+    """In-process LRU cache bounded by the total weight (approximate bytes) of its values"""
+
+    def __init__(self, max_weight: int, weigher: Callable[[Any], int]):
+        self.max_weight = max_weight
+        self.weigher = weigher
+        self.weight = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data: "OrderedDict[Hashable, tuple[Any, int]]" = OrderedDict()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        item = self._data.get(key)
+        if item is None:
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return item[0]
+
+    def set(self, key: Hashable, value: Any, weight: Optional[int] = None) -> None:
+        """Store a value; pass `weight` when it is already known to skip the weigher"""
+        self.pop(key)
+        weight = self.weigher(value) if weight is None else weight
+        if weight > self.max_weight:
+            return
+        self._data[key] = (value, weight)
+        self.weight += weight
+        while self.weight > self.max_weight:
+            _, (_, evicted_weight) = self._data.popitem(last=False)
+            self.weight -= evicted_weight
+            self.evictions += 1
+
+    def weight_of(self, key: Hashable) -> int:
+        item = self._data.get(key)
+        return item[1] if item is not None else 0
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        item = self._data.pop(key, None)
+        if item is None:
+            return default
+        self.weight -= item[1]
+        return item[0]
+
+    def clear(self) -> None:
+        self._data.clear()
+        self.weight = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'size': len(self._data), 'weight': self.weight, 'hits': self.hits,
+            'misses': self.misses, 'evictions': self.evictions
+        }
+
+    def __len__(self) -> int:
+        return len(self._data)
@@ -0,0 +1,114 @@
+import hashlib
+import json
+import sqlite3
+import time
+from typing import Any, Dict, Optional
+from openai.types.chat import ChatCompletion
+
+class CassetteMissError(Exception):
+    """Replay mode found no recording for a request"""
+
+class Cassette:
+    """Record/replay store for LLM completions, backed by one SQLite file
+
+    Requests are keyed by a hash of the model, messages and sampling parameters
+    (not `stream`, so a recording serves both the plain and streaming paths).
+    Modes: 'record' calls the API and stores every response, 'replay' serves
+    only from the file, 'passthrough' bypasses the cassette. Replayed responses
+    are memoized in memory, so repeated lookups cost one dict access.
+    """
+
+    def __init__(self, path: str, mode: str):
+        if mode not in ('record', 'replay', 'passthrough'):
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        self.path = path
+        self.mode = mode
+        self.hits = 0
+        self.misses = 0
+        self.recorded = 0
+        self._memo: Dict[str, ChatCompletion] = {}
+        self._db: Optional[sqlite3.Connection] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != 'passthrough'
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            self._db = sqlite3.connect(self.path)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS completions (
+                    key TEXT PRIMARY KEY,
+                    model TEXT NOT NULL,
+                    content TEXT NOT NULL,
+                    prompt_tokens INTEGER NOT NULL,
+                    completion_tokens INTEGER NOT NULL,
+                    recorded_at REAL NOT NULL
+                )
+            """)
+        return self._db
+
+    @staticmethod
+    def key_for(params: Dict[str, Any]) -> str:
+        request = {name: value for name, value in params.items() if name not in ('stream', 'timeout')}
+        encoded = json.dumps(request, sort_keys=True, separators=(',', ':'), default=str)
+        return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+    def lookup(self, key: str) -> Optional[ChatCompletion]:
+        """Recorded completion for `key`, or None"""
+        completion = self._memo.get(key)
+        if completion is None:
+            row = self._connect().execute(
+                "SELECT model, content, prompt_tokens, completion_tokens FROM completions WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            completion = self._build(key, *row)
+            self._memo[key] = completion
+        self.hits += 1
+        return completion
+
+    def replay(self, params: Dict[str, Any]) -> ChatCompletion:
+        """Recorded completion for a request; raises CassetteMissError when there is none"""
+        completion = self.lookup(self.key_for(params))
+        if completion is None:
+            raise CassetteMissError(f"No recorded completion for this {params.get('model')} request in {self.path}")
+        return completion
+
+    def record(self, params: Dict[str, Any], content: str, prompt_tokens: int = 0, completion_tokens: int = 0) -> None:
+        key = self.key_for(params)
+        model = params.get('model', '')
+        db = self._connect()
+        db.execute(
+            "INSERT OR REPLACE INTO completions VALUES (?, ?, ?, ?, ?, ?)",
+            (key, model, content, prompt_tokens, completion_tokens, time.time())
+        )
+        db.commit()
+        self._memo[key] = self._build(key, model, content, prompt_tokens, completion_tokens)
+        self.recorded += 1
+
+    @staticmethod
+    def _build(key: str, model: str, content: str, prompt_tokens: int, completion_tokens: int) -> ChatCompletion:
+        return ChatCompletion.model_validate({
+            'id': f'cassette-{key[:16]}',
+            'object': 'chat.completion',
+            'created': 0,
+            'model': model,
+            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': content}, 'finish_reason': 'stop'}],
+            'usage': {
+                'prompt_tokens': prompt_tokens,
+                'completion_tokens': completion_tokens,
+                'total_tokens': prompt_tokens + completion_tokens
+            }
+        })
+
+    def close(self) -> None:
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {'mode': self.mode, 'hits': self.hits, 'misses': self.misses, 'recorded': self.recorded}
@@ -1,23 +1,82 @@
+from typing import Dict, Optional, Union
+import httpx
 from supabase import create_client, Client
+from postgrest import AsyncPostgrestClient
+from postgrest.constants import DEFAULT_POSTGREST_CLIENT_HEADERS
 from config import settings
+from sqlite_store import SQLiteStore
 
-# Use Supabase client for all database operations
-supabase: Client = create_client(settings.SUPABASE_URL, settings.SUPABASE_ANON_KEY)
+# Synchronous Supabase client, created on first use so importing this module needs no credentials
+supabase: Optional[Client] = None
+
+class PooledPostgrestClient(AsyncPostgrestClient):
+    """Async PostgREST client backed by a keep-alive connection pool"""
+
+    def create_session(
+        self,
+        base_url: str,
+        headers: Dict[str, str],
+        timeout: Union[int, float, httpx.Timeout],
+    ) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            base_url=base_url,
+            headers=headers,
+            timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=settings.DB_POOL_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.DB_POOL_MAX_KEEPALIVE,
+                keepalive_expiry=settings.DB_POOL_KEEPALIVE_EXPIRY
+            )
+        )
+
+# Shared async client - one connection pool per worker process
+_async_db: Optional[Union[PooledPostgrestClient, SQLiteStore]] = None
 
 def get_supabase_client():
     """Get Supabase client for database operations"""
+    global supabase
+    if supabase is None:
+        supabase = create_client(settings.SUPABASE_URL, settings.SUPABASE_ANON_KEY)
     return supabase
 
-def init_db():
-    """Initialize database connection"""
+def get_async_db() -> Union[PooledPostgrestClient, SQLiteStore]:
+    """Get the shared storage backend used by the services
+    
+    Both backends take the same calls: table(name) with select/insert/update/upsert,
+    eq/lt/gt/is_/order/limit/maybe_single and an awaitable execute(), plus awaitable rpc().
+    STORAGE_BACKEND picks Supabase's PostgREST API or the embedded SQLite store.
+    """
+    global _async_db
+    if _async_db is None and settings.STORAGE_BACKEND == 'sqlite':
+        _async_db = SQLiteStore(settings.SQLITE_PATH)
+    elif _async_db is None:
+        _async_db = PooledPostgrestClient(
+            settings.SUPABASE_REST_URL,
+            headers={
+                **DEFAULT_POSTGREST_CLIENT_HEADERS,
+                "apiKey": settings.SUPABASE_ANON_KEY,
+                "Authorization": f"Bearer {settings.SUPABASE_ANON_KEY}"
+            },
+            timeout=settings.DB_TIMEOUT_SECONDS
+        )
+    return _async_db
+
+async def close_async_db() -> None:
+    """Close the shared client's pooled connections (call on shutdown)"""
+    global _async_db
+    if _async_db is not None:
+        await _async_db.aclose()
+        _async_db = None
+
+async def init_db():
+    """Check the storage backend at startup (creates the SQLite schema when that backend is used)"""
     try:
-        # Test the connection
-        response = supabase.table('situations').select('count', count='exact').limit(1).execute()
-        print(f"Database connection successful. Situations table has {response.count} records.")
+        response = await get_async_db().table('situations').select('id').execute()
+        print(f"Database connection successful ({settings.STORAGE_BACKEND}). Situations table has {len(response.data)} records.")
     except Exception as e:
         print(f"Database connection warning: {e}")
         print("Proceeding with Supabase client for database operations")
 
 def get_db():
     """Dependency for getting database session"""
-    return get_supabase_client()
\ No newline at end of file
+    return get_supabase_client()
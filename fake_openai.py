@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Local OpenAI-compatible stub for offline load testing
+
+Serves POST /v1/chat/completions (plain and streaming) with canned persona
+replies, structured feedback for feedback prompts and short summaries for
+summary prompts, after a configurable latency. Errors and 429s can be
+injected at a given rate, and an optional requests-per-minute limit answers
+429 with a retry-after header, like the real API.
+
+Point the app at it with OPENAI_BASE_URL (no API key needed):
+
+    python fake_openai.py --port 8001 --latency lognormal:400,0.5 --rate-limit-rate 0.05
+    OPENAI_BASE_URL=http://127.0.0.1:8001/v1 python run.py
+
+Latency specs (milliseconds): fixed:MS, uniform:LOW,HIGH, normal:MEAN,STDDEV,
+lognormal:MEDIAN,SIGMA, exponential:MEAN. For streams the latency is the time
+to first token, then each chunk takes --chunk-delay-ms.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import time
+import uuid
+from collections import deque
+from typing import Callable
+
+PERSONA_REPLIES = [
+    "That's a really good point. Can you tell me a bit more about how you handled it at the time?",
+    "I hear you, and I appreciate you explaining that. What would you suggest we do next?",
+    "Interesting! I hadn't thought about it that way. What made you approach it like that?",
+    "Honestly, I'm still a little frustrated, but that helps. How soon could this be sorted out?",
+    "That sounds like a great experience. What was the hardest part of it for you?"
+]
+
+FEEDBACK_REPLY = """PERFORMANCE SCORE: 82
+
+OVERVIEW: The user stayed engaged throughout the conversation and responded to the persona's concerns directly. Answers were clear, though a few could have gone deeper.
+
+STRENGTHS: Asked relevant follow-up questions • Kept a calm and respectful tone • Gave concrete examples
+
+IMPROVEMENT AREAS: Summarize agreements before moving on • Explore the other person's priorities more • Keep answers a little more concise
+
+KEY INSIGHTS: Clarifying questions build trust quickly • Specific examples are more persuasive than general claims • Ending with a next step keeps momentum"""
+
+SUMMARY_REPLY = "The user introduced themselves and discussed their recent work; the persona asked follow-up questions and the tone stayed friendly."
+
+SEGMENT_REPLY = "In this part the user answered clearly and gave one concrete example, but missed a chance to ask a follow-up question when the persona raised a concern."
+
+def parse_latency(spec: str) -> Callable[[], float]:
+    """Turn a latency spec into a sampler returning seconds"""
+    kind, _, raw = spec.partition(':')
+    params = [float(value) for value in raw.split(',')] if raw else []
+    samplers = {
+        'fixed': lambda: params[0],
+        'uniform': lambda: random.uniform(params[0], params[1]),
+        'normal': lambda: max(0.0, random.gauss(params[0], params[1])),
+        'lognormal': lambda: random.lognormvariate(math.log(params[0]), params[1]),
+        'exponential': lambda: random.expovariate(1 / params[0])
+    }
+    if kind not in samplers:
+        raise ValueError(f"Unknown latency spec: {spec}")
+    sample_ms = samplers[kind]
+    return lambda: sample_ms() / 1000
+
+def reply_for(messages: list) -> str:
+    prompt = ' '.join(message.get('content') or '' for message in messages)
+    if 'PERFORMANCE SCORE' in prompt:
+        return FEEDBACK_REPLY
+    if 'running summary' in prompt:
+        return SUMMARY_REPLY
+    if 'TRANSCRIPT SEGMENT' in prompt:
+        return SEGMENT_REPLY
+    return random.choice(PERSONA_REPLIES)
+
+def build_app(args):
+    from starlette.applications import Starlette
+    from starlette.responses import JSONResponse, StreamingResponse
+    from starlette.routing import Route
+
+    latency = parse_latency(args.latency)
+    window = deque()
+    stats = {'requests': 0, 'streams': 0, 'errors_injected': 0, 'rate_limited': 0}
+
+    def error(status: int, message: str, kind: str, headers: dict = None):
+        return JSONResponse({'error': {'message': message, 'type': kind, 'param': None, 'code': None}},
+                            status_code=status, headers=headers)
+
+    def over_rpm_limit() -> bool:
+        if not args.rpm:
+            return False
+        now = time.monotonic()
+        while window and now - window[0] > 60:
+            window.popleft()
+        if len(window) >= args.rpm:
+            return True
+        window.append(now)
+        return False
+
+    async def chat_completions(request):
+        body = await request.json()
+        stats['requests'] += 1
+
+        if random.random() < args.rate_limit_rate or over_rpm_limit():
+            stats['rate_limited'] += 1
+            return error(429, 'Rate limit reached (injected by fake_openai)', 'requests',
+                         headers={'retry-after': str(args.retry_after)})
+        if random.random() < args.error_rate:
+            stats['errors_injected'] += 1
+            await asyncio.sleep(latency())
+            return error(500, 'The server had an error (injected by fake_openai)', 'server_error')
+
+        content = reply_for(body.get('messages', []))
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        created = int(time.time())
+        model = body.get('model', 'gpt-4o-mini')
+        prompt_tokens = sum(len(message.get('content') or '') for message in body.get('messages', [])) // 4
+
+        if body.get('stream'):
+            stats['streams'] += 1
+
+            async def events():
+                await asyncio.sleep(latency())
+                words = content.split(' ')
+                for index, word in enumerate(words):
+                    chunk = {
+                        'id': completion_id, 'object': 'chat.completion.chunk', 'created': created, 'model': model,
+                        'choices': [{'index': 0, 'delta': {'content': word if index == 0 else ' ' + word},
+                                     'finish_reason': None}]
+                    }
+                    yield f"data: {json.dumps(chunk)}\n\n"
+                    await asyncio.sleep(args.chunk_delay_ms / 1000)
+                done = {
+                    'id': completion_id, 'object': 'chat.completion.chunk', 'created': created, 'model': model,
+                    'choices': [{'index': 0, 'delta': {}, 'finish_reason': 'stop'}]
+                }
+                yield f"data: {json.dumps(done)}\n\n"
+                yield "data: [DONE]\n\n"
+
+            return StreamingResponse(events(), media_type='text/event-stream')
+
+        await asyncio.sleep(latency())
+        completion_tokens = len(content) // 4
+        return JSONResponse({
+            'id': completion_id, 'object': 'chat.completion', 'created': created, 'model': model,
+            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': content}, 'finish_reason': 'stop'}],
+            'usage': {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens,
+                      'total_tokens': prompt_tokens + completion_tokens}
+        })
+
+    async def get_stats(request):
+        return JSONResponse(stats)
+
+    return Starlette(routes=[
+        Route('/v1/chat/completions', chat_completions, methods=['POST']),
+        Route('/stats', get_stats)
+    ])
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=int(os.getenv('FAKE_OPENAI_PORT', '8001')))
+    parser.add_argument('--latency', default='lognormal:400,0.4', help='latency spec, see above')
+    parser.add_argument('--chunk-delay-ms', type=float, default=15)
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of requests answered with a 500')
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help='fraction of requests answered with a 429')
+    parser.add_argument('--retry-after', type=float, default=1.0, help='retry-after seconds sent with 429s')
+    parser.add_argument('--rpm', type=int, default=0, help='requests per minute before 429s (0 = unlimited)')
+    parser.add_argument('--seed', type=int, default=None)
+    return parser.parse_args(argv)
+
+def serve(argv=None) -> None:
+    import uvicorn
+
+    args = parse_args(argv)
+    if args.seed is not None:
+        random.seed(args.seed)
+    uvicorn.run(build_app(args), host=args.host, port=args.port, log_level='warning')
+
+if __name__ == '__main__':
+    serve()
@@ -0,0 +1,63 @@
+import re
+from functools import lru_cache
+from typing import Dict, FrozenSet, Iterable, Set, Tuple
+
+def _trie_pattern(words: Iterable[str]) -> str:
+    """Regex alternation for `words`, factored into a trie so shared prefixes are tried once"""
+    trie: dict = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def build(node: dict) -> str:
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        # Optional continuation is greedy, so the longest keyword at a position wins
+        return f'(?:{body})?' if '' in node else body
+
+    return build(trie)
+
+class KeywordMatcher:
+    """Finds which of a fixed set of keywords occur in a text
+
+    Hits follow plain substring semantics, i.e. `keyword in text`. Keywords without
+    whitespace can only occur inside a whitespace-free chunk of the text, so each
+    distinct chunk is scanned once by a precompiled trie regex (a lookahead, so
+    overlapping keywords are all found) and the result is memoized; conversational
+    vocabulary repeats heavily, so most chunks are cache hits. When several keywords
+    start at the same position the regex captures the longest, and the keywords that
+    are prefixes of it are added back from a precomputed table. Phrases containing
+    whitespace are checked against the whole text.
+    """
+
+    def __init__(self, keywords: Iterable[str], cache_size: int = 65536):
+        self.keywords: Tuple[str, ...] = tuple(dict.fromkeys(keywords))
+        self._phrases = tuple(keyword for keyword in self.keywords if any(char.isspace() for char in keyword))
+        words = [keyword for keyword in self.keywords if keyword not in self._phrases]
+        self._pattern = re.compile(f'(?=({_trie_pattern(words)}))') if words else None
+        self._implied: Dict[str, FrozenSet[str]] = {
+            word: frozenset(other for other in words if word.startswith(other))
+            for word in words
+        }
+        self._chunk_hits = lru_cache(maxsize=cache_size)(self._scan_chunk)
+
+    def _scan_chunk(self, chunk: str) -> FrozenSet[str]:
+        hits: Set[str] = set()
+        if self._pattern is not None:
+            for match in set(self._pattern.findall(chunk)):
+                hits |= self._implied[match]
+        return frozenset(hits)
+
+    def find(self, text: str) -> Set[str]:
+        """Every keyword that occurs in `text` (match case is the caller's job)"""
+        hits: Set[str] = set()
+        for chunk in set(text.split()):
+            chunk_hits = self._chunk_hits(chunk)
+            if chunk_hits:
+                hits |= chunk_hits
+        hits.update(phrase for phrase in self._phrases if phrase in text)
+        return hits
@@ -0,0 +1,510 @@
+import asyncio
+import heapq
+import itertools
+import random
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional
+import httpx
+import openai
+from cassette import Cassette, CassetteMissError
+from config import settings
+
+# Scheduling priorities for the rate governor (lower is served first)
+PRIORITY_CHAT = 0
+PRIORITY_FEEDBACK = 1
+PRIORITY_BATCH = 2
+
+_DEADLINES = {
+    PRIORITY_CHAT: settings.OPENAI_CHAT_DEADLINE_SECONDS,
+    PRIORITY_FEEDBACK: settings.OPENAI_FEEDBACK_DEADLINE_SECONDS,
+    PRIORITY_BATCH: settings.OPENAI_BATCH_DEADLINE_SECONDS
+}
+
+# Worth retrying: rate limits, timeouts, dropped connections and 5xx responses
+_TRANSIENT_ERRORS = (openai.RateLimitError, openai.APIConnectionError, openai.InternalServerError)
+
+class LLMUnavailableError(Exception):
+    """An LLM call could not be completed before its deadline"""
+
+# One async client (and connection pool) per worker process, shared by all services
+_client: Optional[openai.AsyncOpenAI] = None
+
+def get_openai_client() -> openai.AsyncOpenAI:
+    """Get the shared async OpenAI client"""
+    global _client
+    if _client is None:
+        _client = openai.AsyncOpenAI(
+            api_key=settings.OPENAI_API_KEY,
+            base_url=settings.OPENAI_BASE_URL,
+            timeout=settings.OPENAI_TIMEOUT_SECONDS,
+            # Retries are handled by chat_completion within the caller's deadline
+            max_retries=0,
+            http_client=httpx.AsyncClient(
+                timeout=settings.OPENAI_TIMEOUT_SECONDS,
+                limits=httpx.Limits(
+                    max_connections=settings.OPENAI_MAX_CONCURRENCY,
+                    max_keepalive_connections=settings.OPENAI_MAX_CONCURRENCY,
+                    keepalive_expiry=settings.OPENAI_KEEPALIVE_EXPIRY
+                )
+            )
+        )
+    return _client
+
+class TokenBucket:
+    """Refills at `rate` units per second up to `capacity`"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def time_until(self, amount: float) -> float:
+        """Seconds until `amount` can be taken (amounts above capacity wait for a full bucket)"""
+        self._refill()
+        missing = min(amount, self.capacity) - self.tokens
+        return max(0.0, missing / self.rate)
+
+    def take(self, amount: float) -> None:
+        self._refill()
+        self.tokens -= min(amount, self.capacity)
+
+    def give_back(self, amount: float) -> None:
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+class RateGovernor:
+    """Admits LLM calls by priority within concurrency, request and token limits
+
+    Waiting calls sit in a priority queue (chat before feedback before batch,
+    FIFO within a priority) and are admitted as slots free up and the request
+    and token buckets refill. A 429 pauses all admissions for its retry-after.
+    """
+
+    def __init__(self, max_concurrency: int, requests_per_minute: int, tokens_per_minute: int, burst_seconds: float):
+        self.max_concurrency = max_concurrency
+        self._requests = TokenBucket(requests_per_minute / 60, max(1.0, requests_per_minute / 60 * burst_seconds))
+        self._tokens = TokenBucket(tokens_per_minute / 60, tokens_per_minute / 60 * burst_seconds)
+        self._in_flight = 0
+        self._paused_until = 0.0
+        self._waiters = []
+        self._order = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self.retries = 0
+        self.rate_limited = 0
+        self.deadline_exceeded = 0
+
+    def _delay_for(self, tokens: int) -> float:
+        """Seconds until a call costing `tokens` fits the buckets (ignores concurrency)"""
+        return max(
+            self._paused_until - time.monotonic(),
+            self._requests.time_until(1),
+            self._tokens.time_until(tokens)
+        )
+
+    def _try_admit(self, tokens: int) -> bool:
+        if self._in_flight >= self.max_concurrency or self._delay_for(tokens) > 0:
+            return False
+        self._requests.take(1)
+        self._tokens.take(tokens)
+        self._in_flight += 1
+        return True
+
+    def _dispatch(self) -> None:
+        """Admit queued calls in priority order until the head no longer fits"""
+        while self._waiters:
+            _, _, tokens, future = self._waiters[0]
+            if future.done():
+                heapq.heappop(self._waiters)
+                continue
+            if not self._try_admit(tokens):
+                break
+            heapq.heappop(self._waiters)
+            future.set_result(None)
+
+        # Blocked on a bucket or a 429 pause rather than a slot: wake up when it clears
+        if self._waiters and self._in_flight < self.max_concurrency and self._timer is None:
+            delay = self._delay_for(self._waiters[0][2])
+            self._timer = asyncio.get_running_loop().call_later(delay, self._on_timer)
+
+    def _on_timer(self) -> None:
+        self._timer = None
+        self._dispatch()
+
+    async def acquire(self, priority: int, tokens: int, deadline: float) -> None:
+        if not self._waiters and self._try_admit(tokens):
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._order), tokens, future))
+        self._dispatch()
+        try:
+            await asyncio.wait_for(asyncio.shield(future), max(0.0, deadline - time.monotonic()))
+        except BaseException as e:
+            if future.done() and not future.cancelled():
+                # Admitted just as we gave up - hand the slot on
+                self.release()
+            else:
+                future.cancel()
+            if isinstance(e, asyncio.TimeoutError):
+                self.deadline_exceeded += 1
+                raise LLMUnavailableError("Timed out waiting for LLM capacity")
+            raise
+
+    def release(self) -> None:
+        self._in_flight -= 1
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, priority: int, tokens: int, deadline: float):
+        """Hold one admitted call for the duration of the block"""
+        await self.acquire(priority, tokens, deadline)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def settle(self, estimated: int, actual: int) -> None:
+        """Correct the token bucket once the real usage is known"""
+        if actual < estimated:
+            self._tokens.give_back(estimated - actual)
+        elif actual > estimated:
+            self._tokens.take(actual - estimated)
+
+    def record_error(self, error: Exception) -> Optional[float]:
+        """Note a transient error; on a 429, pause admissions and return its retry-after"""
+        if not isinstance(error, openai.RateLimitError):
+            return None
+        self.rate_limited += 1
+        retry_after = None
+        try:
+            retry_after = float(error.response.headers.get('retry-after'))
+        except (TypeError, ValueError, AttributeError):
+            pass
+        pause = retry_after if retry_after is not None else settings.OPENAI_RETRY_BASE_SECONDS
+        self._paused_until = max(self._paused_until, time.monotonic() + pause)
+        return retry_after
+
+    def stats(self) -> Dict[str, Any]:
+        waiting = {'chat': 0, 'feedback': 0, 'batch': 0}
+        names = {PRIORITY_CHAT: 'chat', PRIORITY_FEEDBACK: 'feedback', PRIORITY_BATCH: 'batch'}
+        for priority, _, _, future in self._waiters:
+            if not future.done():
+                waiting[names.get(priority, 'batch')] += 1
+        return {
+            'max_concurrency': self.max_concurrency,
+            'in_flight': self._in_flight,
+            'waiting': sum(waiting.values()),
+            'waiting_by_priority': waiting,
+            'retries': self.retries,
+            'rate_limited': self.rate_limited,
+            'deadline_exceeded': self.deadline_exceeded
+        }
+
+class CircuitBreaker:
+    """Per-backend breaker on a latency SLO and recent errors
+
+    Closed: calls go through, and their outcomes and chat latencies fill a rolling
+    window. The breaker opens when the window's p95 latency breaches the SLO or its
+    error count reaches the threshold. While open, calls are refused at once so
+    callers can serve the local engine. After the cooldown it goes half-open and
+    lets one probe call through, a call the SLO applies to: only that call's
+    outcome counts, and a fast success closes the breaker while anything else
+    reopens it. A probe that ends without an outcome (rate limited, deadline,
+    cancelled before sending) is released so the next eligible call can probe.
+    """
+
+    _PASS = object()  # ticket for calls made while the breaker is closed
+
+    def __init__(self, name: str, latency_slo: float, error_threshold: int, window: int, min_samples: int, cooldown: float):
+        self.name = name
+        self.latency_slo = latency_slo
+        self.error_threshold = error_threshold
+        self.min_samples = min_samples
+        self.cooldown = cooldown
+        self.state = 'closed'
+        self.opens = 0
+        self.short_circuited = 0
+        self._latencies = deque(maxlen=window)
+        self._errors = deque(maxlen=window)
+        self._opened_at = 0.0
+        self._probe: Optional[object] = None
+        self._probe_started = 0.0
+
+    def allow(self, probe_eligible: bool = True) -> Optional[object]:
+        """A ticket for a call that may go to the backend now, or None if it should not be made"""
+        if self.state == 'closed':
+            return self._PASS
+        now = time.monotonic()
+        if self.state == 'open':
+            if now - self._opened_at < self.cooldown:
+                self.short_circuited += 1
+                return None
+            self.state = 'half_open'
+        # One probe at a time; a probe that never reported back expires after the cooldown
+        if not probe_eligible or (self._probe is not None and now - self._probe_started < self.cooldown):
+            self.short_circuited += 1
+            return None
+        self._probe = object()
+        self._probe_started = now
+        return self._probe
+
+    def record(self, ticket: object, error: bool, latency: Optional[float] = None) -> None:
+        """Record a call's outcome; `latency` is only passed for calls the SLO applies to"""
+        if self.is_probe(ticket):
+            self._probe = None
+            if error or latency is None or latency > self.latency_slo:
+                self._trip()
+            else:
+                self._close()
+            return
+        if self.state != 'closed':
+            # A call admitted before the breaker opened; the probe decides from here
+            return
+
+        self._errors.append(error)
+        if latency is not None:
+            self._latencies.append(latency)
+        if sum(self._errors) >= self.error_threshold or (
+            len(self._latencies) >= self.min_samples and self.p95() > self.latency_slo
+        ):
+            self._trip()
+
+    def is_probe(self, ticket: object) -> bool:
+        return ticket is not None and ticket is self._probe
+
+    def release(self, ticket: object) -> None:
+        """End a call's claim on the breaker; frees the probe slot if it never recorded an outcome"""
+        if self.is_probe(ticket):
+            self._probe = None
+
+    def p95(self) -> Optional[float]:
+        if not self._latencies:
+            return None
+        ordered = sorted(self._latencies)
+        return ordered[int(0.95 * (len(ordered) - 1))]
+
+    def _trip(self) -> None:
+        self.state = 'open'
+        self.opens += 1
+        self._opened_at = time.monotonic()
+        print(f"Circuit breaker '{self.name}' opened (p95={self.p95()}, errors={sum(self._errors)})")
+
+    def _close(self) -> None:
+        self.state = 'closed'
+        self._latencies.clear()
+        self._errors.clear()
+        print(f"Circuit breaker '{self.name}' closed")
+
+    def stats(self) -> Dict[str, Any]:
+        p95 = self.p95()
+        return {
+            'state': self.state,
+            'p95_latency_seconds': round(p95, 3) if p95 is not None else None,
+            'latency_slo_seconds': self.latency_slo,
+            'errors_in_window': sum(self._errors),
+            'opens': self.opens,
+            'short_circuited': self.short_circuited
+        }
+
+openai_breaker = CircuitBreaker(
+    'openai',
+    latency_slo=settings.OPENAI_LATENCY_SLO_SECONDS,
+    error_threshold=settings.BREAKER_ERROR_THRESHOLD,
+    window=settings.BREAKER_WINDOW,
+    min_samples=settings.BREAKER_MIN_SAMPLES,
+    cooldown=settings.BREAKER_COOLDOWN_SECONDS
+)
+
+cassette = Cassette(settings.LLM_CASSETTE_PATH, settings.LLM_CASSETTE_MODE)
+
+_governor = RateGovernor(
+    max_concurrency=settings.OPENAI_MAX_CONCURRENCY,
+    requests_per_minute=settings.OPENAI_REQUESTS_PER_MINUTE,
+    tokens_per_minute=settings.OPENAI_TOKENS_PER_MINUTE,
+    burst_seconds=settings.OPENAI_BURST_SECONDS
+)
+
+def _estimate_tokens(params: Dict[str, Any]) -> int:
+    """Prompt (~4 characters per token) plus the completion allowance"""
+    prompt_chars = sum(len(message.get('content') or '') for message in params.get('messages', []))
+    return prompt_chars // 4 + params.get('max_tokens', 256)
+
+def _backoff_delay(attempt: int, retry_after: Optional[float]) -> float:
+    """Full-jitter exponential backoff, never shorter than the server's retry-after"""
+    ceiling = min(settings.OPENAI_RETRY_MAX_SECONDS, settings.OPENAI_RETRY_BASE_SECONDS * 2 ** attempt)
+    return max(random.uniform(0, ceiling), retry_after or 0.0)
+
+def _check_breaker(priority: int) -> object:
+    """The breaker ticket for one attempt; only chat calls may probe a half-open breaker"""
+    ticket = openai_breaker.allow(probe_eligible=priority == PRIORITY_CHAT)
+    if ticket is None:
+        raise LLMUnavailableError("OpenAI circuit breaker is open")
+    return ticket
+
+def _record_error(error: Exception, ticket: object) -> None:
+    # 429s are quota pressure, handled by the governor, not a sign of an unhealthy backend
+    if not isinstance(error, openai.RateLimitError):
+        openai_breaker.record(ticket, error=True)
+
+def _record_latency(priority: int, started: float, ticket: object) -> None:
+    """Record a completed (or abandoned) call; only live chat calls count toward the SLO"""
+    latency = time.monotonic() - started if priority == PRIORITY_CHAT else None
+    openai_breaker.record(ticket, error=False, latency=latency)
+
+def _record_attempt_error(error: Exception, ticket: object) -> None:
+    """A transient error that will be retried only counts if it was the half-open probe's"""
+    if openai_breaker.is_probe(ticket):
+        _record_error(error, ticket)
+
+async def _retry_or_fail(attempt: int, error: Exception, deadline: float, ticket: object) -> None:
+    """Wait before the next attempt; a call that runs out of time counts as one breaker error"""
+    try:
+        await _wait_to_retry(attempt, error, deadline)
+    except LLMUnavailableError:
+        _record_error(error, ticket)
+        raise
+
+async def _wait_to_retry(attempt: int, error: Exception, deadline: float) -> None:
+    delay = _backoff_delay(attempt, _governor.record_error(error))
+    if time.monotonic() + delay >= deadline:
+        _governor.deadline_exceeded += 1
+        raise LLMUnavailableError(f"LLM call failed before its deadline: {error}") from error
+    _governor.retries += 1
+    await asyncio.sleep(delay)
+
+async def _live_chat_completion(priority: int, params: Dict[str, Any]):
+    """Create a chat completion through the rate governor, retrying transient errors until the deadline
+
+    The breaker sees one outcome per call: its success, or its final failure.
+    """
+    deadline = time.monotonic() + _DEADLINES[priority]
+    estimate = _estimate_tokens(params)
+    attempt = 0
+    while True:
+        ticket = _check_breaker(priority)
+        try:
+            async with _governor.slot(priority, estimate, deadline):
+                started = time.monotonic()
+                try:
+                    response = await get_openai_client().chat.completions.create(
+                        timeout=max(1.0, deadline - time.monotonic()), **params
+                    )
+                except _TRANSIENT_ERRORS as e:
+                    _record_attempt_error(e, ticket)
+                    error = e
+                except openai.APIError:
+                    openai_breaker.record(ticket, error=True)
+                    raise
+                except asyncio.CancelledError:
+                    # Abandoned by a hedge: still tells us the backend is at least this slow
+                    _record_latency(priority, started, ticket)
+                    raise
+                else:
+                    _record_latency(priority, started, ticket)
+                    if response.usage:
+                        _governor.settle(estimate, response.usage.total_tokens)
+                    return response
+            await _retry_or_fail(attempt, error, deadline, ticket)
+        finally:
+            openai_breaker.release(ticket)
+        attempt += 1
+
+async def _live_stream_chat_completion(priority: int, params: Dict[str, Any]) -> AsyncIterator[str]:
+    """Stream a chat completion's text deltas; only opening the stream is retried"""
+    deadline = time.monotonic() + _DEADLINES[priority]
+    estimate = _estimate_tokens(params)
+    attempt = 0
+    while True:
+        ticket = _check_breaker(priority)
+        try:
+            async with _governor.slot(priority, estimate, deadline):
+                started = time.monotonic()
+                try:
+                    stream = await get_openai_client().chat.completions.create(
+                        stream=True, timeout=max(1.0, deadline - time.monotonic()), **params
+                    )
+                except _TRANSIENT_ERRORS as e:
+                    _record_attempt_error(e, ticket)
+                    error = e
+                except openai.APIError:
+                    openai_breaker.record(ticket, error=True)
+                    raise
+                except asyncio.CancelledError:
+                    _record_latency(priority, started, ticket)
+                    raise
+                else:
+                    # For streams the SLO applies to time to first token
+                    first = True
+                    try:
+                        async for chunk in stream:
+                            if first:
+                                _record_latency(priority, started, ticket)
+                                first = False
+                            if chunk.choices and chunk.choices[0].delta.content:
+                                yield chunk.choices[0].delta.content
+                    finally:
+                        if first:
+                            _record_latency(priority, started, ticket)
+                        # Release the connection even when the consumer stops early
+                        await stream.response.aclose()
+                    return
+            await _retry_or_fail(attempt, error, deadline, ticket)
+        finally:
+            openai_breaker.release(ticket)
+        attempt += 1
+
+def _replay(params: Dict[str, Any]):
+    try:
+        return cassette.replay(params)
+    except CassetteMissError as e:
+        raise LLMUnavailableError(str(e)) from e
+
+async def chat_completion(priority: int = PRIORITY_CHAT, **params: Any):
+    """Create a chat completion, served from or recorded to the cassette when one is active"""
+    if cassette.mode == 'replay':
+        return _replay(params)
+    response = await _live_chat_completion(priority, params)
+    if cassette.mode == 'record' and response.choices:
+        usage = response.usage
+        cassette.record(params, response.choices[0].message.content or '',
+                        usage.prompt_tokens if usage else 0, usage.completion_tokens if usage else 0)
+    return response
+
+async def stream_chat_completion(priority: int = PRIORITY_CHAT, **params: Any) -> AsyncIterator[str]:
+    """Stream a chat completion's text deltas, served from or recorded to the cassette when one is active"""
+    if cassette.mode == 'replay':
+        yield _replay(params).choices[0].message.content or ''
+        return
+    deltas = []
+    async for delta in _live_stream_chat_completion(priority, params):
+        deltas.append(delta)
+        yield delta
+    # Only complete streams are recorded; a consumer that stops early never gets here
+    if cassette.mode == 'record':
+        cassette.record(params, ''.join(deltas))
+
+def get_llm_stats() -> Dict[str, Any]:
+    """Current rate-governor state for this worker"""
+    stats = _governor.stats()
+    if cassette.enabled:
+        stats['cassette'] = cassette.stats()
+    return stats
+
+def get_breaker_stats() -> Dict[str, Dict[str, Any]]:
+    """Circuit breaker state per backend for this worker"""
+    return {openai_breaker.name: openai_breaker.stats()}
+
+async def close_openai_client() -> None:
+    """Close the shared client's pooled connections (call on shutdown)"""
+    global _client
+    cassette.close()
+    if _client is not None:
+        await _client.close()
+        _client = None
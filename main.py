@@ -1,25 +1,27 @@
 from fastapi import FastAPI, Request, Form, HTTPException, Depends, status
-from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse
+from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
 import uvicorn
-from typing import Optional, List
+from typing import Optional, List, Dict
+import asyncio
+import json
 import uuid
 from datetime import datetime
 
-from database import get_db, init_db
+from database import get_db, init_db, close_async_db
+from llm import close_openai_client, get_llm_stats, get_breaker_stats
 from models import *
 from services import (
     UserService, SituationService, SessionService, 
-    MessageService, AIPersonaService, FeedbackService
+    MessageService, AIPersonaService, FeedbackService,
+    last_active_buffer, situation_catalog, user_cache, transcript_cache,
+    system_prompt_cache, opening_pool, feedback_jobs, conversation_stats
 )
 from config import settings
 
 app = FastAPI(title=settings.APP_NAME)
 
-# Initialize database
-init_db()
-
 # Setup templates and static files
 templates = Jinja2Templates(directory="templates")
 app.mount("/static", StaticFiles(directory="static"), name="static")
@@ -32,6 +34,31 @@ message_service = MessageService()
 ai_service = AIPersonaService()
 feedback_service = FeedbackService()
 
+# Strong references to fire-and-forget tasks so they aren't garbage collected mid-run
+background_tasks = set()
+
+@app.on_event("startup")
+async def startup():
+    """Check storage, warm in-process caches and start background writers"""
+    await init_db()
+    try:
+        await situation_catalog.load()
+        # Fill the opening-message pools in the background
+        for situation in await situation_catalog.get_active():
+            ai_service.refill_openers(situation)
+    except Exception as e:
+        print(f"Situation catalog warm-up failed, will load on first request: {e}")
+    last_active_buffer.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    """Flush buffered writes and release pooled database connections"""
+    opening_pool.stop()
+    await feedback_jobs.stop()
+    await last_active_buffer.stop()
+    await close_async_db()
+    await close_openai_client()
+
 # Routes
 
 @app.get("/", response_class=HTMLResponse)
@@ -41,15 +68,8 @@ async def home(request: Request, user_uuid: Optional[str] = None):
         # Get or create user
         user = await user_service.create_or_get_user(user_uuid)
         
-        # Get all situations grouped by category
-        situations = await situation_service.get_all_situations()
-        
-        # Group situations by category
-        categories = {}
-        for situation in situations:
-            if situation.category not in categories:
-                categories[situation.category] = []
-            categories[situation.category].append(situation)
+        # Get all situations grouped by category (precomputed by the situation catalog)
+        categories = await situation_service.get_situations_by_category()
         
         return templates.TemplateResponse("home.html", {
             "request": request,
@@ -81,6 +101,9 @@ async def start_session(
         if not session:
             raise HTTPException(status_code=400, detail="Unable to create session")
         
+        # Generate the opening message while the browser follows the redirect
+        _start_opening_message(str(session.id), await situation_catalog.get(situation_id))
+        
         # Redirect to chat interface
         return RedirectResponse(url=f"/session/{session.id}?user_uuid={user.session_uuid}", status_code=303)
         
@@ -116,22 +139,17 @@ async def chat_interface(request: Request, session_id: str, user_uuid: str):
             print(f"Invalid session status: {session_data.status}")
             raise HTTPException(status_code=400, detail="Session is not accessible")
         
-        # If no messages yet, generate AI opening message
-        if not session_data.messages:
-            try:
-                opening_message = await ai_service.generate_response(session_data.situation, [])
-                await message_service.add_message(session_id, "persona", opening_message)
-                # Refresh session data
-                session_data = await session_service.get_session_with_messages(session_id)
-                print(f"Generated opening message for session {session_id}")
-            except Exception as e:
-                print(f"Error generating opening message: {e}")
-                # Continue without opening message - user can start the conversation
+        # Render right away; the page fetches the opening message once it exists.
+        # Starting it here too covers reloads and sessions created on another worker.
+        awaiting_opener = not session_data.messages and session_data.status == 'active'
+        if awaiting_opener:
+            _start_opening_message(session_id, session_data.situation)
         
         return templates.TemplateResponse("chat.html", {
             "request": request,
             "session": session_data,
             "user": user,
+            "awaiting_opener": awaiting_opener,
             "app_name": settings.APP_NAME
         })
         
@@ -146,55 +164,131 @@ async def chat_interface(request: Request, session_id: str, user_uuid: str):
             "error": "Unable to load chat session. Please try again."
         })
 
-@app.post("/session/{session_id}/message")
-async def send_message(
-    session_id: str,
-    message: str = Form(...),
-    user_uuid: str = Form(...)
-):
-    """Send a message in the chat session"""
+# session_id -> task generating its opening message (per worker)
+opening_tasks: Dict[str, asyncio.Task] = {}
+
+async def _create_opening_message(session_id: str, situation: Situation) -> Optional[DialogueMessage]:
+    try:
+        opening_message = await ai_service.generate_opening_message(situation)
+        # Idempotent insert - a no-op if the session already has an opener or any message
+        saved_message = await message_service.add_opening_message(session_id, opening_message)
+        if saved_message:
+            print(f"Generated opening message for session {session_id}")
+        return saved_message
+    except Exception as e:
+        print(f"Error generating opening message: {e}")
+        return None
+
+def _start_opening_message(session_id: str, situation: Optional[Situation]) -> Optional[asyncio.Task]:
+    """Start generating a session's opening message in the background, once per worker"""
+    if situation is None:
+        return None
+    task = opening_tasks.get(session_id)
+    if task is None:
+        task = asyncio.create_task(_create_opening_message(session_id, situation))
+        opening_tasks[session_id] = task
+        task.add_done_callback(lambda _: opening_tasks.pop(session_id, None))
+    return task
+
+@app.get("/session/{session_id}/opening")
+async def get_opening_message(session_id: str, user_uuid: str):
+    """Wait for the session's opening message (requested by chat.html when it renders empty)"""
     try:
-        # Input validation
-        if not message or not message.strip():
-            return JSONResponse({"error": "Message cannot be empty"}, status_code=400)
-        
-        if len(message.strip()) > 1000:
-            return JSONResponse({"error": "Message too long (max 1000 characters)"}, status_code=400)
-        
-        # Enhanced user and session validation
         user = await user_service.create_or_get_user(user_uuid)
-        if not user:
-            return JSONResponse({"error": "Invalid user session"}, status_code=403)
-        
         session_data = await session_service.get_session_with_messages(session_id)
-        if not session_data:
+        if not user or not session_data:
             return JSONResponse({"error": "Session not found"}, status_code=404)
         
-        # Verify user owns this session
         if str(session_data.user_id) != str(user.id):
-            print(f"Message send - ownership mismatch: session.user_id={session_data.user_id}, user.id={user.id}")
             return JSONResponse({"error": "Access denied"}, status_code=403)
         
-        # Verify session is active
-        if session_data.status != 'active':
-            return JSONResponse({"error": "Session is no longer active"}, status_code=400)
-        
-        # Check message limit per session
-        current_user_messages = len([msg for msg in session_data.messages if msg.message_type == 'user'])
-        if current_user_messages >= settings.MAX_MESSAGES_PER_SESSION:
-            return JSONResponse({"error": "Message limit reached for this session"}, status_code=400)
-        
-        # Add user message
-        user_message = await message_service.add_message(session_id, "user", message.strip())
-        if not user_message:
-            return JSONResponse({"error": "Failed to save user message"}, status_code=500)
+        if not session_data.messages:
+            task = _start_opening_message(session_id, session_data.situation)
+            if task:
+                try:
+                    await asyncio.wait_for(asyncio.shield(task), timeout=settings.OPENING_WAIT_SECONDS)
+                except asyncio.TimeoutError:
+                    return JSONResponse({"ready": False})
+            session_data = await session_service.get_session_with_messages(session_id)
+            if not session_data or not session_data.messages:
+                return JSONResponse({"ready": False})
+        
+        # If the user spoke first there is no opener to show
+        first_message = session_data.messages[0]
+        return JSONResponse({
+            "ready": True,
+            "message": _message_json(first_message) if first_message.message_type == "persona" else None
+        })
         
-        # Update user activity
-        await user_service.update_last_active(str(user.id))
+    except Exception as e:
+        print(f"Error getting opening message: {e}")
+        return JSONResponse({"error": "Internal server error"}, status_code=500)
+
+def _message_json(message: DialogueMessage) -> dict:
+    return {
+        "id": str(message.id),
+        "content": message.content,
+        "timestamp": message.timestamp.isoformat()
+    }
+
+async def _save_user_turn(session_id: str, message: str, user_uuid: str):
+    """Validate a chat turn and store the user's message
+    
+    Returns (session_data, user_message, None) on success or (None, None, error_response).
+    """
+    # Input validation
+    if not message or not message.strip():
+        return None, None, JSONResponse({"error": "Message cannot be empty"}, status_code=400)
+    
+    if len(message.strip()) > 1000:
+        return None, None, JSONResponse({"error": "Message too long (max 1000 characters)"}, status_code=400)
+    
+    # Enhanced user and session validation
+    user = await user_service.create_or_get_user(user_uuid)
+    if not user:
+        return None, None, JSONResponse({"error": "Invalid user session"}, status_code=403)
+    
+    session_data = await session_service.get_session_with_messages(session_id)
+    if not session_data:
+        return None, None, JSONResponse({"error": "Session not found"}, status_code=404)
+    
+    # Verify user owns this session
+    if str(session_data.user_id) != str(user.id):
+        print(f"Message send - ownership mismatch: session.user_id={session_data.user_id}, user.id={user.id}")
+        return None, None, JSONResponse({"error": "Access denied"}, status_code=403)
+    
+    # Verify session is active
+    if session_data.status != 'active':
+        return None, None, JSONResponse({"error": "Session is no longer active"}, status_code=400)
+    
+    # Check message limit per session
+    current_user_messages = len([msg for msg in session_data.messages if msg.message_type == 'user'])
+    if current_user_messages >= settings.MAX_MESSAGES_PER_SESSION:
+        return None, None, JSONResponse({"error": "Message limit reached for this session"}, status_code=400)
+    
+    # Add user message
+    user_message = await message_service.add_message(session_id, "user", message.strip())
+    if not user_message:
+        return None, None, JSONResponse({"error": "Failed to save user message"}, status_code=500)
+    
+    return session_data, user_message, None
+
+@app.post("/session/{session_id}/message")
+async def send_message(
+    session_id: str,
+    message: str = Form(...),
+    user_uuid: str = Form(...)
+):
+    """Send a message in the chat session"""
+    try:
+        session_data, user_message, error_response = await _save_user_turn(session_id, message, user_uuid)
+        if error_response:
+            return error_response
         
         # Generate AI response
         try:
-            updated_messages = await message_service.get_session_messages(session_id)
+            # The transcript was loaded with the session; append the new message locally
+            updated_messages = session_data.messages + [user_message]
             ai_response = await ai_service.generate_response(session_data.situation, updated_messages)
             
             # Add AI message
@@ -202,11 +296,7 @@ async def send_message(
             
             return JSONResponse({
                 "success": True,
-                "user_message": {
-                    "id": str(user_message.id),
-                    "content": user_message.content,
-                    "timestamp": user_message.timestamp.isoformat()
-                },
+                "user_message": _message_json(user_message),
                 "ai_message": {
                     "id": str(ai_message.id) if ai_message else None,
                     "content": ai_response,
@@ -219,11 +309,7 @@ async def send_message(
             # Return user message even if AI response fails
             return JSONResponse({
                 "success": True,
-                "user_message": {
-                    "id": str(user_message.id),
-                    "content": user_message.content,
-                    "timestamp": user_message.timestamp.isoformat()
-                },
+                "user_message": _message_json(user_message),
                 "ai_message": {
                     "id": None,
                     "content": "I'm having trouble responding right now. Please try sending another message.",
@@ -237,12 +323,80 @@ async def send_message(
         traceback.print_exc()
         return JSONResponse({"error": "Failed to send message. Please try again."}, status_code=500)
 
+def _sse(event: str, data: dict) -> str:
+    """Format one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.post("/session/{session_id}/message/stream")
+async def send_message_stream(
+    session_id: str,
+    message: str = Form(...),
+    user_uuid: str = Form(...)
+):
+    """Send a message and stream the persona reply as Server-Sent Events
+    
+    Events: user_message, then token events as the reply is generated, then done
+    (with the saved ai_message) or error.
+    """
+    try:
+        session_data, user_message, error_response = await _save_user_turn(session_id, message, user_uuid)
+        if error_response:
+            return error_response
+    except Exception as e:
+        print(f"Error sending message: {e}")
+        return JSONResponse({"error": "Failed to send message. Please try again."}, status_code=500)
+    
+    events: asyncio.Queue = asyncio.Queue()
+    updated_messages = session_data.messages + [user_message]
+    
+    async def generate_reply():
+        # Runs as its own task so the reply is still saved if the client disconnects
+        parts = []
+        try:
+            async for chunk in ai_service.generate_response_stream(session_data.situation, updated_messages):
+                parts.append(chunk)
+                events.put_nowait(_sse("token", {"content": chunk}))
+            
+            ai_response = "".join(parts).strip()
+            ai_message = await message_service.add_message(session_id, "persona", ai_response)
+            events.put_nowait(_sse("done", {
+                "ai_message": {
+                    "id": str(ai_message.id) if ai_message else None,
+                    "content": ai_response,
+                    "timestamp": ai_message.timestamp.isoformat() if ai_message else datetime.now().isoformat()
+                }
+            }))
+        except Exception as ai_error:
+            print(f"Error streaming AI response: {ai_error}")
+            events.put_nowait(_sse("error", {
+                "error": "I'm having trouble responding right now. Please try sending another message."
+            }))
+        finally:
+            events.put_nowait(None)
+    
+    task = asyncio.create_task(generate_reply())
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    
+    async def event_stream():
+        yield _sse("user_message", _message_json(user_message))
+        while True:
+            event = await events.get()
+            if event is None:
+                break
+            yield event
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"  # Disable proxy buffering so tokens arrive as they are generated
+    })
+
 @app.post("/session/{session_id}/end")
 async def end_session(
     session_id: str,
     user_uuid: str = Form(...)
 ):
-    """End the roleplay session and generate feedback"""
+    """End the roleplay session and queue feedback generation"""
     try:
         # Verify user owns this session
         user = await user_service.create_or_get_user(user_uuid)
@@ -256,8 +410,8 @@ async def end_session(
         if not success:
             return JSONResponse({"error": "Failed to end session"}, status_code=500)
         
-        # Generate feedback
-        feedback = await feedback_service.generate_session_feedback(session_id)
+        # Feedback is generated in the background; the feedback page shows it when ready
+        feedback_jobs.enqueue(session_id, feedback_service.generate_session_feedback)
         
         return JSONResponse({
             "success": True,
@@ -279,10 +433,14 @@ async def feedback_page(request: Request, session_id: str, user_uuid: str):
         if not session_data or str(session_data.user_id) != str(user.id):
             raise HTTPException(status_code=403, detail="Session not found or access denied")
         
+        feedback_state = _feedback_state(session_data)
+        
         return templates.TemplateResponse("feedback.html", {
             "request": request,
             "session": session_data,
             "user": user,
+            "feedback_pending": feedback_state == 'pending',
+            "feedback_failed": feedback_state == 'failed',
             "app_name": settings.APP_NAME
         })
         
@@ -295,19 +453,52 @@ async def feedback_page(request: Request, session_id: str, user_uuid: str):
             "error": "Unable to load feedback. Please try again."
         })
 
+def _feedback_state(session_data: SessionWithMessages) -> str:
+    """'ready', 'pending' or 'failed' for a session's feedback; (re)queues the job while pending"""
+    if session_data.summary or session_data.status != 'completed' or not session_data.messages:
+        return 'ready'
+    session_id = str(session_data.id)
+    if feedback_jobs.has_failed(session_id):
+        return 'failed'
+    # Covers jobs lost to a restart or queued on another worker - the claim prevents double
+    # work, and the queue backs off and gives up on sessions that keep failing
+    feedback_jobs.enqueue(session_id, feedback_service.generate_session_feedback)
+    return 'pending'
+
+@app.get("/session/{session_id}/feedback/status")
+async def get_feedback_status(session_id: str, user_uuid: str):
+    """Whether the session's feedback is ready (polled by feedback.html while it is pending)"""
+    try:
+        user = await user_service.create_or_get_user(user_uuid)
+        session_data = await session_service.get_session_with_messages(session_id)
+        if not user or not session_data:
+            return JSONResponse({"error": "Session not found"}, status_code=404)
+        
+        if str(session_data.user_id) != str(user.id):
+            return JSONResponse({"error": "Access denied"}, status_code=403)
+        
+        state = _feedback_state(session_data)
+        return JSONResponse({"ready": state == 'ready', "failed": state == 'failed'})
+        
+    except Exception as e:
+        print(f"Error getting feedback status: {e}")
+        return JSONResponse({"error": "Internal server error"}, status_code=500)
+
 @app.get("/history", response_class=HTMLResponse)
-async def session_history(request: Request, user_uuid: str):
+async def session_history(request: Request, user_uuid: str, before: Optional[str] = None):
     """Display user's session history"""
     try:
         # Get user
         user = await user_service.create_or_get_user(user_uuid)
         
-        # Get user's sessions
-        sessions = await session_service.get_user_sessions(str(user.id))
+        # Get a page of the user's sessions (keyset on started_at, id)
+        sessions = await session_service.get_user_sessions(str(user.id), before=before)
+        next_before = session_service.history_cursor(sessions[-1]) if len(sessions) == settings.HISTORY_PAGE_SIZE else None
         
         return templates.TemplateResponse("history.html", {
             "request": request,
             "sessions": sessions,
+            "next_before": next_before,
             "user": user,
             "app_name": settings.APP_NAME
         })
@@ -351,6 +542,21 @@ async def review_session(request: Request, session_id: str, user_uuid: str):
 async def health_check():
     return {"status": "healthy", "app": settings.APP_NAME}
 
+# Per-worker runtime metrics
+@app.get("/metrics")
+async def metrics():
+    return {
+        "llm": get_llm_stats(),
+        "circuit_breakers": get_breaker_stats(),
+        "user_cache": user_cache.stats(),
+        "transcript_cache": transcript_cache.stats(),
+        "conversation_stats": conversation_stats.stats(),
+        "system_prompts": system_prompt_cache.stats(),
+        "opening_pool": opening_pool.stats(),
+        "feedback_jobs": feedback_jobs.stats(),
+        "situation_catalog_version": situation_catalog.version
+    }
+
 # Error handlers
 @app.exception_handler(404)
 async def not_found_handler(request: Request, exc):
@@ -38,6 +38,7 @@ class RoleplaySession(BaseModel):
     ended_at: Optional[datetime] = None
     status: str = "active"
     session_duration: int = 0
+    next_message_order: int = 0
 
 class DialogueMessageCreate(BaseModel):
     session_id: UUID
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Re-score completed sessions in bulk
+
+Regenerates session_summaries for every completed session, e.g. after the
+feedback prompt changed. Sessions are read from storage a page at a time in id
+order (the next page is fetched while the current one is scored). Up to
+--concurrency are scored at once at batch priority through this process's own
+LLM rate governor, so set OPENAI_REQUESTS_PER_MINUTE / OPENAI_TOKENS_PER_MINUTE
+to the share of the account limits the job may use alongside live traffic.
+Each page's summaries are upserted in one request.
+
+Progress is checkpointed after every page. Rerunning with the same
+--checkpoint file resumes after the last finished page, and --restart starts
+over. Sessions whose AI analysis fails keep their old summary and are listed
+in the checkpoint, unless --allow-fallback stores the rule-based analysis:
+
+    python rescore.py --concurrency 16 --page-size 100
+    python rescore.py --limit 500 --checkpoint rescore_checkpoint.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+from typing import List, Optional
+
+from config import settings
+from database import close_async_db, get_async_db
+from llm import PRIORITY_BATCH, close_openai_client, get_llm_stats
+from models import SessionWithMessages
+from services import FeedbackService, SessionService
+
+def load_checkpoint(path: str, restart: bool) -> dict:
+    if not restart and os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    return {'cursor': None, 'scored': 0, 'failed': []}
+
+def save_checkpoint(path: str, checkpoint: dict) -> None:
+    # Write-then-rename, so an interrupted run never leaves a truncated checkpoint
+    with open(path + '.tmp', 'w') as f:
+        json.dump(checkpoint, f, indent=2)
+    os.replace(path + '.tmp', path)
+
+async def fetch_page(cursor: Optional[str], size: int) -> List[SessionWithMessages]:
+    """The next `size` completed sessions with an id after `cursor`, with transcripts"""
+    db = get_async_db()
+    if settings.SESSION_FETCH_MODE == 'concurrent':
+        query = db.table('roleplay_sessions').select('id').eq('status', 'completed')
+        if cursor:
+            query = query.gt('id', cursor)
+        response = await query.order('id').limit(size).execute()
+        session_service = SessionService()
+        sessions = await asyncio.gather(*(session_service.get_session_with_messages(row['id']) for row in response.data))
+        return [session for session in sessions if session]
+
+    query = db.table('session_details').select('*').eq('status', 'completed')
+    if cursor:
+        query = query.gt('id', cursor)
+    response = await query.order('id').limit(size).execute()
+    return [SessionWithMessages(**row) for row in response.data]
+
+async def score_page(feedback_service: FeedbackService, sessions: List[SessionWithMessages],
+                     semaphore: asyncio.Semaphore, allow_fallback: bool):
+    """Summary rows for the sessions that could be scored, and the ids of those that could not"""
+    async def score(session: SessionWithMessages):
+        async with semaphore:
+            try:
+                feedback = await feedback_service.score_session(session, PRIORITY_BATCH, fallback=allow_fallback)
+            except Exception as e:
+                print(f"Could not score session {session.id}: {e}")
+                return None
+        return {'session_id': str(session.id), **FeedbackService.summary_fields(feedback)}
+
+    results = await asyncio.gather(*(score(session) for session in sessions if session.messages))
+    rows = [row for row in results if row]
+    scored_ids = {row['session_id'] for row in rows}
+    failed = [str(session.id) for session in sessions if session.messages and str(session.id) not in scored_ids]
+    return rows, failed
+
+async def rescore(args) -> dict:
+    feedback_service = FeedbackService()
+    semaphore = asyncio.Semaphore(args.concurrency)
+    checkpoint = load_checkpoint(args.checkpoint, args.restart)
+    if checkpoint['cursor']:
+        print(f"Resuming after session {checkpoint['cursor']} ({checkpoint['scored']} already scored)")
+
+    started = time.perf_counter()
+    scored = failed = pages = fetched = 0
+
+    def next_size() -> int:
+        return args.page_size if args.limit is None else min(args.page_size, args.limit - fetched)
+
+    next_page = asyncio.ensure_future(fetch_page(checkpoint['cursor'], next_size()))
+    while next_page is not None:
+        sessions = await next_page
+        if not sessions:
+            break
+        fetched += len(sessions)
+        # Read ahead while this page is being scored
+        next_page = asyncio.ensure_future(fetch_page(str(sessions[-1].id), next_size())) if next_size() > 0 else None
+
+        rows, page_failed = await score_page(feedback_service, sessions, semaphore, args.allow_fallback)
+        if rows:
+            await get_async_db().table('session_summaries').upsert(rows, on_conflict='session_id').execute()
+
+        pages += 1
+        scored += len(rows)
+        failed += len(page_failed)
+        checkpoint['cursor'] = str(sessions[-1].id)
+        checkpoint['scored'] += len(rows)
+        checkpoint['failed'].extend(page_failed)
+        save_checkpoint(args.checkpoint, checkpoint)
+
+        elapsed = time.perf_counter() - started
+        print(f"page {pages}: {len(rows)} scored, {len(page_failed)} failed "
+              f"| {scored} total, {scored / elapsed:.2f} sessions/s")
+
+    elapsed = time.perf_counter() - started
+    return {
+        'pages': pages, 'scored': scored, 'failed': failed,
+        'elapsed_s': round(elapsed, 3),
+        'sessions_per_second': round(scored / elapsed, 2) if elapsed else 0.0
+    }
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--page-size', type=int, default=100, help='sessions read and upserted per page')
+    parser.add_argument('--concurrency', type=int, default=8, help='sessions scored at once')
+    parser.add_argument('--limit', type=int, help='stop after this many sessions')
+    parser.add_argument('--checkpoint', default='rescore_checkpoint.json')
+    parser.add_argument('--restart', action='store_true', help='ignore an existing checkpoint')
+    parser.add_argument('--allow-fallback', action='store_true',
+                        help='store the rule-based analysis when the AI call fails')
+    return parser.parse_args()
+
+async def main() -> None:
+    args = parse_args()
+    try:
+        results = await rescore(args)
+        print(f"{results['scored']} sessions scored ({results['failed']} failed) in {results['pages']} pages, "
+              f"{results['elapsed_s']:.1f}s, {results['sessions_per_second']:.2f} sessions/s")
+        print(f"LLM: {json.dumps(get_llm_stats())}")
+    finally:
+        await close_openai_client()
+        await close_async_db()
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -1,37 +1,103 @@
 import uuid
 from datetime import datetime, timedelta, timezone
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, AsyncIterator
 import dateutil.parser
-from database import get_supabase_client
+from database import get_async_db
 from models import (
     User, UserCreate, Situation, RoleplaySession, RoleplaySessionCreate,
     DialogueMessage, DialogueMessageCreate, SessionSummary, SessionSummaryCreate,
     SessionWithSituation, SessionWithMessages
 )
 from config import settings
+from cache import TTLCache, SizedLRUCache
+from keywords import KeywordMatcher
+from llm import chat_completion, stream_chat_completion, LLMUnavailableError, PRIORITY_FEEDBACK, PRIORITY_BATCH
 import json
 import random
 import openai
 import asyncio
+import time
+import hashlib
+from collections import deque
+
+class LastActiveBuffer:
+    """Write-behind buffer that collapses last_active updates into periodic batched upserts"""
+    
+    def __init__(self, flush_interval: float):
+        self.flush_interval = flush_interval
+        self._pending: Dict[str, Dict[str, str]] = {}
+        self._task: Optional[asyncio.Task] = None
+    
+    def touch(self, user: User) -> None:
+        """Record activity; only the latest timestamp per user is written on the next flush"""
+        now = datetime.now(timezone.utc)
+        user.last_active = now
+        self._pending[str(user.id)] = {
+            'id': str(user.id),
+            'session_uuid': str(user.session_uuid),
+            'last_active': now.isoformat()
+        }
+    
+    async def flush(self) -> None:
+        """Write all pending timestamps in one upsert"""
+        if not self._pending:
+            return
+        rows, self._pending = list(self._pending.values()), {}
+        try:
+            await get_async_db().table('users').upsert(rows, on_conflict='id', returning='minimal').execute()
+        except Exception as e:
+            print(f"Error flushing last_active updates: {e}")
+            # Keep the rows for the next flush unless the user was touched again meanwhile
+            for row in rows:
+                self._pending.setdefault(row['id'], row)
+    
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+    
+    async def stop(self) -> None:
+        """Stop the periodic flush and write whatever is still pending"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+    
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+# Process-wide user identity cache (keyed by session_uuid) and activity buffer
+user_cache = TTLCache(maxsize=settings.USER_CACHE_SIZE, ttl=settings.USER_CACHE_TTL_SECONDS)
+last_active_buffer = LastActiveBuffer(flush_interval=settings.LAST_ACTIVE_FLUSH_SECONDS)
 
 class UserService:
     def __init__(self):
-        self.supabase = get_supabase_client()
+        self.db = get_async_db()
     
     async def create_or_get_user(self, session_uuid: Optional[str] = None) -> Optional[User]:
         """Create a new anonymous user or get existing one by session UUID"""
         try:
             if session_uuid:
+                cached_user = user_cache.get(session_uuid)
+                if cached_user:
+                    last_active_buffer.touch(cached_user)
+                    return cached_user
+                
                 # Try to get existing user with better error handling
                 try:
-                    response = self.supabase.table('users').select('*').eq('session_uuid', session_uuid).maybe_single().execute()
+                    response = await self.db.table('users').select('*').eq('session_uuid', session_uuid).maybe_single().execute()
                     if response and response.data:
-                        # Update last active time
-                        self.supabase.table('users').update({
-                            'last_active': datetime.now().isoformat()
-                        }).eq('session_uuid', session_uuid).execute()
+                        user = User(**response.data)
+                        user_cache.set(session_uuid, user)
+                        # Update last active time (written behind in batches)
+                        last_active_buffer.touch(user)
                         
-                        return User(**response.data)
+                        return user
                 except Exception as e:
                     print(f"Error fetching existing user: {e}")
             
@@ -45,10 +111,12 @@ class UserService:
                 'last_active': current_time
             }
             
-            response = self.supabase.table('users').insert(user_data).execute()
+            response = await self.db.table('users').insert(user_data).execute()
             if response and response.data and len(response.data) > 0:
                 print(f"Created new user with session_uuid: {new_uuid}")
-                return User(**response.data[0])
+                user = User(**response.data[0])
+                user_cache.set(new_uuid, user)
+                return user
             
             raise Exception(f"Failed to create user - response: {response}")
             
@@ -61,7 +129,7 @@ class UserService:
     async def get_user_by_session_uuid(self, session_uuid: str) -> Optional[User]:
         """Get user by session UUID with validation"""
         try:
-            response = self.supabase.table('users').select('*').eq('session_uuid', session_uuid).maybe_single().execute()
+            response = await self.db.table('users').select('*').eq('session_uuid', session_uuid).maybe_single().execute()
             if response and response.data:
                 return User(**response.data)
             return None
@@ -72,7 +140,7 @@ class UserService:
     async def validate_user_session(self, user_id: str, session_uuid: str) -> bool:
         """Validate that user_id matches session_uuid"""
         try:
-            response = self.supabase.table('users').select('id').eq('session_uuid', session_uuid).eq('id', user_id).maybe_single().execute()
+            response = await self.db.table('users').select('id').eq('session_uuid', session_uuid).eq('id', user_id).maybe_single().execute()
             return response and response.data is not None
         except Exception as e:
             print(f"Error validating user session: {e}")
@@ -81,39 +149,158 @@ class UserService:
     async def update_last_active(self, user_id: str) -> None:
         """Update user's last active timestamp"""
         try:
-            self.supabase.table('users').update({
+            await self.db.table('users').update({
                 'last_active': datetime.now(timezone.utc).isoformat()
             }).eq('id', user_id).execute()
         except Exception as e:
             print(f"Error updating last active: {e}")
 
-class SituationService:
-    def __init__(self):
-        self.supabase = get_supabase_client()
+class SituationCatalog:
+    """Process-wide snapshot of the situations table
+    
+    Loaded at startup and refreshed in the background once `ttl` has passed
+    (or after invalidate()), so request handlers never wait on a situations read.
+    """
+    
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self.version = 0
+        self._by_id: Dict[int, Situation] = {}
+        self._active: List[Situation] = []
+        self._categories: Dict[str, List[Situation]] = {}
+        self._loaded_at: Optional[float] = None
+        self._refresh_task: Optional[asyncio.Task] = None
+    
+    async def load(self) -> None:
+        """Read all situations and rebuild the id index and category grouping"""
+        response = await get_async_db().table('situations').select('*').order('category, difficulty_level, title').execute()
+        situations = [Situation(**item) for item in response.data]
+        active = [situation for situation in situations if situation.is_active]
+        
+        # Grouping used by home.html, ordered by category, difficulty and title
+        categories: Dict[str, List[Situation]] = {}
+        for situation in active:
+            categories.setdefault(situation.category, []).append(situation)
+        
+        self._by_id = {situation.id: situation for situation in situations}
+        self._active = active
+        self._categories = categories
+        self._loaded_at = time.monotonic()
+        self.version += 1
+    
+    def invalidate(self) -> None:
+        """Refresh on next access (in the background if a snapshot is already loaded)"""
+        self._loaded_at = None if not self._by_id else float('-inf')
+    
+    async def _ensure_loaded(self) -> None:
+        if self._loaded_at is None:
+            # Nothing to serve yet - load inline once
+            await self.load()
+        elif time.monotonic() - self._loaded_at > self.ttl and not self._refresh_task:
+            # Serve the current snapshot while a background task refreshes it
+            self._refresh_task = asyncio.create_task(self._refresh())
     
+    async def _refresh(self) -> None:
+        try:
+            await self.load()
+        except Exception as e:
+            print(f"Error refreshing situation catalog: {e}")
+        finally:
+            self._refresh_task = None
+    
+    async def get(self, situation_id: int) -> Optional[Situation]:
+        await self._ensure_loaded()
+        return self._by_id.get(situation_id)
+    
+    async def get_active(self) -> List[Situation]:
+        await self._ensure_loaded()
+        return self._active
+    
+    async def get_categories(self) -> Dict[str, List[Situation]]:
+        await self._ensure_loaded()
+        return self._categories
+
+situation_catalog = SituationCatalog(ttl=settings.SITUATION_CATALOG_TTL_SECONDS)
+
+class SituationService:
     async def get_all_situations(self) -> List[Situation]:
         """Get all active situations"""
         try:
-            response = self.supabase.table('situations').select('*').eq('is_active', True).order('category, difficulty_level, title').execute()
-            return [Situation(**item) for item in response.data]
+            return await situation_catalog.get_active()
         except Exception as e:
             print(f"Error getting situations: {e}")
             return []
     
+    async def get_situations_by_category(self) -> Dict[str, List[Situation]]:
+        """Get active situations grouped by category"""
+        try:
+            return await situation_catalog.get_categories()
+        except Exception as e:
+            print(f"Error getting situations by category: {e}")
+            return {}
+    
     async def get_situation_by_id(self, situation_id: int) -> Optional[Situation]:
         """Get situation by ID"""
         try:
-            response = self.supabase.table('situations').select('*').eq('id', situation_id).maybe_single().execute()
-            if response.data:
-                return Situation(**response.data)
-            return None
+            return await situation_catalog.get(situation_id)
         except Exception as e:
             print(f"Error getting situation {situation_id}: {e}")
             return None
 
+class TranscriptCache:
+    """Per-session transcript cache for the chat loop
+    
+    Holds active sessions (situation and ordered messages), filled on first load
+    and extended in place by MessageService.add_message. Each entry carries the
+    session's next_message_order: with TRANSCRIPT_CACHE_VALIDATION = 'version' a
+    hit is confirmed against that counter on the session row, so messages written
+    by another worker force a reload; 'affinity' trusts the entry outright and is
+    only safe when a session is always routed to the same worker.
+    """
+    
+    MESSAGE_OVERHEAD = 512  # approximate bytes per cached DialogueMessage besides its content
+    
+    def __init__(self, max_bytes: int):
+        self._cache = SizedLRUCache(max_weight=max_bytes, weigher=self._weigh)
+    
+    @classmethod
+    def _weigh(cls, session: SessionWithMessages) -> int:
+        return 4096 + sum(cls.MESSAGE_OVERHEAD + len(msg.content) for msg in session.messages)
+    
+    def get(self, session_id: str) -> Optional[SessionWithMessages]:
+        return self._cache.get(session_id)
+    
+    def put(self, session: SessionWithMessages) -> None:
+        last_order = session.messages[-1].message_order if session.messages else -1
+        # Only cache transcripts that agree with the counter they were read with
+        if session.status == 'active' and last_order + 1 == session.next_message_order:
+            self._cache.set(str(session.id), session)
+    
+    def append(self, session_id: str, message: DialogueMessage) -> None:
+        """Extend a cached transcript with a message that was just written"""
+        session = self._cache.get(session_id)
+        if session is None:
+            return
+        if message.message_order != session.next_message_order:
+            # Another writer got in between - drop the entry and reload on next access
+            self._cache.pop(session_id)
+            return
+        weight = self._cache.weight_of(session_id) + self.MESSAGE_OVERHEAD + len(message.content)
+        session.messages.append(message)
+        session.next_message_order = message.message_order + 1
+        self._cache.set(session_id, session, weight=weight)
+    
+    def evict(self, session_id: str) -> None:
+        self._cache.pop(session_id)
+    
+    def stats(self) -> Dict[str, int]:
+        return self._cache.stats()
+
+transcript_cache = TranscriptCache(max_bytes=settings.TRANSCRIPT_CACHE_MAX_BYTES)
+
 class SessionService:
     def __init__(self):
-        self.supabase = get_supabase_client()
+        self.db = get_async_db()
     
     async def create_session(self, user_id: str, situation_id: int) -> Optional[RoleplaySession]:
         """Create a new roleplay session with validation"""
@@ -124,19 +311,19 @@ class SessionService:
                 return None
             
             # Verify user exists
-            user_check = self.supabase.table('users').select('id').eq('id', user_id).maybe_single().execute()
+            user_check = await self.db.table('users').select('id').eq('id', user_id).maybe_single().execute()
             if not user_check or not user_check.data:
                 print(f"User {user_id} not found for session creation")
                 return None
             
             # Verify situation exists
-            situation_check = self.supabase.table('situations').select('id').eq('id', situation_id).eq('is_active', True).maybe_single().execute()
-            if not situation_check or not situation_check.data:
+            situation = await situation_catalog.get(situation_id)
+            if not situation or not situation.is_active:
                 print(f"Situation {situation_id} not found or inactive")
                 return None
             
             # Check for existing active session
-            existing_session = self.supabase.table('roleplay_sessions').select('id').eq('user_id', user_id).eq('status', 'active').maybe_single().execute()
+            existing_session = await self.db.table('roleplay_sessions').select('id').eq('user_id', user_id).eq('status', 'active').maybe_single().execute()
             if existing_session and existing_session.data:
                 print(f"User {user_id} already has an active session: {existing_session.data['id']}")
                 # Optionally end the existing session or return it
@@ -148,7 +335,7 @@ class SessionService:
                 'started_at': datetime.now(timezone.utc).isoformat()
             }
             
-            response = self.supabase.table('roleplay_sessions').insert(session_data).execute()
+            response = await self.db.table('roleplay_sessions').insert(session_data).execute()
             if response and response.data and len(response.data) > 0:
                 print(f"Created session {response.data[0]['id']} for user {user_id}")
                 return RoleplaySession(**response.data[0])
@@ -162,72 +349,113 @@ class SessionService:
             traceback.print_exc()
             return None
     
-    async def get_user_sessions(self, user_id: str) -> List[SessionWithSituation]:
-        """Get all sessions for a user with situation details"""
+    async def get_user_sessions(self, user_id: str, before: Optional[str] = None,
+                                limit: Optional[int] = None) -> List[SessionWithSituation]:
+        """Get a page of a user's sessions (newest first) with situation details and message counts"""
         try:
-            response = self.supabase.table('roleplay_sessions').select('*').eq('user_id', user_id).order('started_at', desc=True).execute()
+            # session_overviews embeds the situation and aggregates the message count, so a
+            # page is one query. The keyset is (started_at, id): `before` is the previous
+            # page's last "started_at|id", see history_cursor()
+            limit = limit or settings.HISTORY_PAGE_SIZE
+            if not before:
+                response = await self._session_overviews(user_id).limit(limit).execute()
+                return [SessionWithSituation(**session_data) for session_data in response.data]
             
-            sessions = []
-            for session_data in response.data:
-                # Get situation details
-                situation_response = self.supabase.table('situations').select('*').eq('id', session_data['situation_id']).maybe_single().execute()
-                
-                # Get message count
-                message_count_response = self.supabase.table('dialogue_messages').select('id', count='exact').eq('session_id', session_data['id']).execute()
-                message_count = message_count_response.count if message_count_response.count else 0
-                
-                session = SessionWithSituation(
-                    **session_data,
-                    situation=Situation(**situation_response.data) if situation_response.data else None,
-                    message_count=message_count
-                )
-                sessions.append(session)
+            started_at, _, session_id = before.partition('|')
+            # started_at < cursor OR (started_at = cursor AND id < cursor id), as two
+            # queries because the PostgREST client has no or-filter
+            older_query = self._session_overviews(user_id).lt('started_at', started_at).limit(limit)
+            if session_id:
+                tied_query = self._session_overviews(user_id).eq('started_at', started_at).lt('id', session_id).limit(limit)
+                tied, older = await asyncio.gather(tied_query.execute(), older_query.execute())
+                rows = tied.data + older.data
+            else:
+                rows = (await older_query.execute()).data
             
-            return sessions
+            return [SessionWithSituation(**session_data) for session_data in rows[:limit]]
         except Exception as e:
             print(f"Error getting user sessions: {e}")
             return []
     
+    def _session_overviews(self, user_id: str):
+        return self.db.table('session_overviews').select('*').eq('user_id', user_id).order('started_at.desc,id.desc')
+    
+    @staticmethod
+    def history_cursor(session: SessionWithSituation) -> str:
+        """The `before` value for the page after the one ending with `session`"""
+        return f"{session.started_at.isoformat()}|{session.id}"
+    
     async def get_session_with_messages(self, session_id: str) -> Optional[SessionWithMessages]:
         """Get session with all messages and summary"""
         try:
-            # Get session
-            session_response = self.supabase.table('roleplay_sessions').select('*').eq('id', session_id).maybe_single().execute()
-            if not session_response or not session_response.data:
-                print(f"Session {session_id} not found")
-                return None
-            
-            # Get situation
-            situation_response = self.supabase.table('situations').select('*').eq('id', session_response.data['situation_id']).maybe_single().execute()
-            if not situation_response or not situation_response.data:
-                print(f"Situation {session_response.data['situation_id']} not found")
-                return None
-            
-            # Get messages
-            messages_response = self.supabase.table('dialogue_messages').select('*').eq('session_id', session_id).order('message_order').execute()
-            messages_data = messages_response.data if messages_response and messages_response.data else []
+            cached = transcript_cache.get(session_id)
+            if cached is not None and await self._is_cached_session_current(cached):
+                # Hand out a copy so callers can't mutate the cached transcript
+                return cached.model_copy(update={'messages': list(cached.messages)})
             
-            # Get summary
-            summary_response = self.supabase.table('session_summaries').select('*').eq('session_id', session_id).maybe_single().execute()
-            summary_data = summary_response.data if summary_response and summary_response.data else None
+            if settings.SESSION_FETCH_MODE == 'concurrent':
+                session = await self._get_session_with_messages_concurrent(session_id)
+            else:
+                # session_details embeds situation, ordered messages and summary - one round trip
+                response = await self.db.table('session_details').select('*').eq('id', session_id).maybe_single().execute()
+                if not response or not response.data:
+                    print(f"Session {session_id} not found")
+                    return None
+                session = SessionWithMessages(**response.data)
             
-            return SessionWithMessages(
-                **session_response.data,
-                situation=Situation(**situation_response.data),
-                messages=[DialogueMessage(**msg) for msg in messages_data],
-                summary=SessionSummary(**summary_data) if summary_data else None
-            )
+            if session and session.summary and session.summary.performance_score is None:
+                # A summary row without a score is a feedback job's claim, not feedback yet
+                session.summary = None
+            if session:
+                transcript_cache.put(session.model_copy(update={'messages': list(session.messages)}))
+            return session
         except Exception as e:
             print(f"Error getting session with messages: {e}")
             import traceback
             traceback.print_exc()
             return None
     
+    async def _is_cached_session_current(self, cached: SessionWithMessages) -> bool:
+        """Check a cached transcript against the session row's message counter"""
+        if settings.TRANSCRIPT_CACHE_VALIDATION == 'affinity':
+            return True
+        response = await self.db.table('roleplay_sessions').select('status', 'next_message_order').eq('id', str(cached.id)).maybe_single().execute()
+        if not response or not response.data:
+            return False
+        return response.data['status'] == 'active' and response.data['next_message_order'] == cached.next_message_order
+    
+    async def _get_session_with_messages_concurrent(self, session_id: str) -> Optional[SessionWithMessages]:
+        """Fallback for backends without the session_details view: run the table reads concurrently"""
+        # The situation comes from the in-process catalog, so this is a single parallel round
+        session_response, messages_response, summary_response = await asyncio.gather(
+            self.db.table('roleplay_sessions').select('*').eq('id', session_id).maybe_single().execute(),
+            self.db.table('dialogue_messages').select('*').eq('session_id', session_id).order('message_order').execute(),
+            self.db.table('session_summaries').select('*').eq('session_id', session_id).maybe_single().execute()
+        )
+        if not session_response or not session_response.data:
+            print(f"Session {session_id} not found")
+            return None
+        
+        situation = await situation_catalog.get(session_response.data['situation_id'])
+        if not situation:
+            print(f"Situation {session_response.data['situation_id']} not found")
+            return None
+        
+        messages_data = messages_response.data if messages_response and messages_response.data else []
+        summary_data = summary_response.data if summary_response and summary_response.data else None
+        
+        return SessionWithMessages(
+            **session_response.data,
+            situation=situation,
+            messages=[DialogueMessage(**msg) for msg in messages_data],
+            summary=SessionSummary(**summary_data) if summary_data else None
+        )
+    
     async def end_session(self, session_id: str) -> bool:
         """End a session and calculate duration"""
         try:
             # Get session start time
-            session_response = self.supabase.table('roleplay_sessions').select('started_at').eq('id', session_id).maybe_single().execute()
+            session_response = await self.db.table('roleplay_sessions').select('started_at').eq('id', session_id).maybe_single().execute()
             if not session_response or not session_response.data:
                 print(f"Session {session_id} not found for ending")
                 return False
@@ -252,12 +480,14 @@ class SessionService:
             duration = max(1, int(abs(duration_seconds)))
             
             # Update session
-            update_response = self.supabase.table('roleplay_sessions').update({
+            update_response = await self.db.table('roleplay_sessions').update({
                 'ended_at': ended_at.isoformat(),
                 'status': 'completed',
                 'session_duration': duration
             }).eq('id', session_id).execute()
             
+            transcript_cache.evict(session_id)
+            
             if update_response and update_response.data:
                 print(f"Session {session_id} ended successfully. Duration: {duration} seconds")
                 return True
@@ -273,48 +503,468 @@ class SessionService:
 
 class MessageService:
     def __init__(self):
-        self.supabase = get_supabase_client()
+        self.db = get_async_db()
     
     async def add_message(self, session_id: str, message_type: str, content: str) -> Optional[DialogueMessage]:
         """Add a new message to the session"""
         try:
-            # Get current message count for ordering
-            count_response = self.supabase.table('dialogue_messages').select('id', count='exact').eq('session_id', session_id).execute()
-            message_order = count_response.count if count_response.count else 0
-            
-            message_data = {
-                'session_id': session_id,
-                'message_type': message_type,
-                'content': content,
-                'message_order': message_order,
-                'timestamp': datetime.now(timezone.utc).isoformat()
-            }
-            
-            response = self.supabase.table('dialogue_messages').insert(message_data).execute()
+            # append_dialogue_message bumps roleplay_sessions.next_message_order and inserts
+            # in one statement, so ordering is atomic and independent of transcript length
+            request = await self.db.rpc('append_dialogue_message', {
+                'p_session_id': session_id,
+                'p_message_type': message_type,
+                'p_content': content
+            })
+            response = await request.execute()
             if response.data:
-                return DialogueMessage(**response.data[0])
+                message = DialogueMessage(**response.data[0])
+                transcript_cache.append(session_id, message)
+                conversation_stats.record(session_id, message)
+                return message
             return None
         except Exception as e:
             print(f"Error adding message: {e}")
             return None
     
+    async def add_opening_message(self, session_id: str, content: str) -> Optional[DialogueMessage]:
+        """Add the persona's opening message unless the session already has messages"""
+        try:
+            # append_opening_message only inserts while next_message_order = 0, so a
+            # repeated or concurrent call cannot add a second opener
+            request = await self.db.rpc('append_opening_message', {
+                'p_session_id': session_id,
+                'p_content': content
+            })
+            response = await request.execute()
+            if response.data:
+                message = DialogueMessage(**response.data[0])
+                transcript_cache.append(session_id, message)
+                conversation_stats.record(session_id, message)
+                return message
+            # Another request got there first; our cached copy may still look empty
+            transcript_cache.evict(session_id)
+            return None
+        except Exception as e:
+            print(f"Error adding opening message: {e}")
+            return None
+    
     async def get_session_messages(self, session_id: str) -> List[DialogueMessage]:
         """Get all messages for a session"""
         try:
-            response = self.supabase.table('dialogue_messages').select('*').eq('session_id', session_id).order('message_order').execute()
+            response = await self.db.table('dialogue_messages').select('*').eq('session_id', session_id).order('message_order').execute()
             return [DialogueMessage(**msg) for msg in response.data]
         except Exception as e:
             print(f"Error getting session messages: {e}")
             return []
 
+class ConversationContextManager:
+    """Keeps persona prompts within a token budget as sessions grow
+    
+    The most recent messages are sent verbatim. Older ones are folded into a
+    running summary, extended in the background a batch at a time and cached per
+    session, so late-session turns cost about the same as early ones.
+    """
+    
+    def __init__(self):
+        # session_id -> (number of messages covered by the summary, summary text)
+        self._summaries = TTLCache(maxsize=settings.CONTEXT_SUMMARY_CACHE_SIZE, ttl=settings.CONTEXT_SUMMARY_TTL_SECONDS)
+        self._folding = set()
+        self._tasks = set()
+    
+    @staticmethod
+    def estimate_tokens(text: str) -> int:
+        # ~4 characters per token for English text, plus per-message framing
+        return len(text) // 4 + 4
+    
+    def build(self, system_prompt: str, conversation_history: List[DialogueMessage]) -> list:
+        """Build the chat messages: system prompt, running summary, then recent turns within budget"""
+        messages = [{"role": "system", "content": system_prompt}]
+        if not conversation_history:
+            return messages
+        
+        session_id = str(conversation_history[0].session_id)
+        covered, summary = self._summaries.get(session_id) or (0, "")
+        if covered > len(conversation_history):
+            covered, summary = 0, ""
+        
+        # Fold older messages into the summary off the request path
+        recent_start = max(0, len(conversation_history) - settings.CONTEXT_RECENT_MESSAGES)
+        if recent_start - covered >= settings.CONTEXT_FOLD_BATCH:
+            self._schedule_fold(session_id, summary, covered, conversation_history[covered:recent_start])
+        
+        budget = settings.CONTEXT_TOKEN_BUDGET - self.estimate_tokens(system_prompt)
+        if summary:
+            summary_message = {"role": "system", "content": f"Summary of the conversation so far: {summary}"}
+            messages.append(summary_message)
+            budget -= self.estimate_tokens(summary_message["content"])
+        
+        # Messages not yet summarized go in verbatim, newest first until the budget runs out
+        verbatim = []
+        for msg in reversed(conversation_history[covered:]):
+            cost = self.estimate_tokens(msg.content)
+            if verbatim and cost > budget:
+                break
+            budget -= cost
+            verbatim.append({
+                "role": "user" if msg.message_type == "user" else "assistant",
+                "content": msg.content
+            })
+        messages.extend(reversed(verbatim))
+        return messages
+    
+    def _schedule_fold(self, session_id: str, summary: str, covered: int, batch: List[DialogueMessage]) -> None:
+        if session_id in self._folding:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._folding.add(session_id)
+        task = loop.create_task(self._fold(session_id, summary, covered, batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+    
+    async def _fold(self, session_id: str, summary: str, covered: int, batch: List[DialogueMessage]) -> None:
+        try:
+            new_summary = await self._summarize(summary, batch)
+            self._summaries.set(session_id, (covered + len(batch), new_summary))
+        except Exception as e:
+            print(f"Error folding conversation summary for session {session_id}: {e}")
+        finally:
+            self._folding.discard(session_id)
+    
+    async def _summarize(self, summary: str, batch: List[DialogueMessage]) -> str:
+        """Extend the running summary with a batch of messages"""
+        transcript = "\n".join(
+            f"{'USER' if msg.message_type == 'user' else 'PERSONA'}: {msg.content}" for msg in batch
+        )
+        prompt = f"""You maintain a running summary of a roleplay conversation for the persona playing it.
+
+SUMMARY SO FAR:
+{summary or "(none)"}
+
+NEW MESSAGES:
+{transcript}
+
+Rewrite the summary to include the new messages in under 120 words. Keep facts the user shared, commitments made, and the current emotional tone. Output only the summary."""
+        
+        try:
+            response = await chat_completion(
+                priority=PRIORITY_BATCH,
+                model=settings.OPENAI_MODEL,
+                messages=[{"role": "user", "content": prompt}],
+                max_tokens=settings.CONTEXT_SUMMARY_MAX_TOKENS,
+                temperature=0.2
+            )
+            new_summary = response.choices[0].message.content.strip()
+            if new_summary:
+                return new_summary
+        except Exception as e:
+            print(f"Summary generation failed, using extractive summary: {e}")
+        
+        # Extractive fallback: first sentence of each message, bounded in size
+        points = [
+            f"{'User' if msg.message_type == 'user' else 'You'}: {msg.content.split('.')[0][:120]}"
+            for msg in batch
+        ]
+        return (summary + " " + " | ".join(points)).strip()[-settings.CONTEXT_SUMMARY_MAX_TOKENS * 4:]
+
+conversation_context = ConversationContextManager()
+
+CATEGORY_PROMPT_INSTRUCTIONS = {
+    'career': """
+
+CAREER SCENARIO INSTRUCTIONS:
+- Ask follow-up questions about experience and skills
+- Present realistic interview challenges
+- Show genuine interest in candidate responses
+- Maintain professional but approachable tone
+- Ask behavioral and technical questions naturally""",
+    'customer_service': """
+
+CUSTOMER SERVICE SCENARIO INSTRUCTIONS:
+- Express genuine frustration about the problem
+- Vary your emotional state based on agent responses
+- Be willing to escalate or de-escalate naturally
+- Show appreciation when agent provides good solutions
+- Remain human and realistic in your complaints""",
+    'social': """
+
+SOCIAL SCENARIO INSTRUCTIONS:
+- Be genuinely interested in getting to know the person
+- Share personal anecdotes and ask engaging questions
+- Show enthusiasm about shared interests
+- Maintain a friendly, warm conversational tone
+- React naturally to awkward or smooth moments""",
+    'management': """
+
+MANAGEMENT SCENARIO INSTRUCTIONS:
+- Show realistic employee emotions (nervousness, defensiveness, etc.)
+- Be receptive to constructive feedback when delivered well
+- Express concerns and ask clarifying questions
+- Demonstrate willingness to improve when supported properly
+- React authentically to different management approaches""",
+    'networking': """
+
+NETWORKING SCENARIO INSTRUCTIONS:
+- Show genuine professional interest in others
+- Share relevant business experiences and insights
+- Look for collaboration opportunities naturally
+- Maintain professional enthusiasm
+- Exchange ideas and explore mutual benefits"""
+}
+
+class SystemPromptCache:
+    """Compiled persona system prompts keyed by situation id and content hash
+    
+    Cleared whenever the situation catalog reloads, so edited situations pick up
+    a fresh prompt; the content hash also covers situations read outside the catalog.
+    """
+    
+    def __init__(self, maxsize: int):
+        self._prompts = TTLCache(maxsize=maxsize)
+        self._catalog_version = None
+    
+    @staticmethod
+    def content_hash(situation: Situation) -> str:
+        fields = (situation.title, situation.description, situation.persona_script,
+                  situation.difficulty_level or "", situation.category)
+        return hashlib.sha1("\x1f".join(fields).encode("utf-8")).hexdigest()
+    
+    def get(self, situation: Situation, compile_prompt) -> str:
+        if self._catalog_version != situation_catalog.version:
+            self._prompts.clear()
+            self._catalog_version = situation_catalog.version
+        key = (situation.id, self.content_hash(situation))
+        prompt = self._prompts.get(key)
+        if prompt is None:
+            prompt = compile_prompt(situation)
+            self._prompts.set(key, prompt)
+        return prompt
+    
+    def stats(self) -> Dict[str, int]:
+        return self._prompts.stats()
+
+system_prompt_cache = SystemPromptCache(maxsize=settings.SYSTEM_PROMPT_CACHE_SIZE)
+
+class OpeningMessagePool:
+    """Pre-generated persona opening messages per situation
+    
+    Each opener is handed out once. Pools are topped up by a background task
+    when they run low, so the first chat page never waits on the LLM.
+    """
+    
+    def __init__(self, size: int, low_water: int):
+        self.size = size
+        self.low_water = low_water
+        self.hits = 0
+        self.misses = 0
+        # (situation id, content hash) -> openers ready to use
+        self._pools: Dict[tuple, deque] = {}
+        self._refilling = set()
+        self._tasks = set()
+    
+    @staticmethod
+    def _key(situation: Situation) -> tuple:
+        return (situation.id, SystemPromptCache.content_hash(situation))
+    
+    def take(self, situation: Situation, generate) -> Optional[str]:
+        """Pop an opener (None if the pool is empty) and schedule a refill when running low"""
+        pool = self._pools.get(self._key(situation))
+        opener = pool.popleft() if pool else None
+        if opener is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        if not pool or len(pool) < self.low_water:
+            self.refill(situation, generate)
+        return opener
+    
+    def refill(self, situation: Situation, generate) -> None:
+        """Top up a situation's pool in the background using `generate(situation)`"""
+        key = self._key(situation)
+        if self.size <= 0 or key in self._refilling:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._refilling.add(key)
+        task = loop.create_task(self._fill(key, situation, generate))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+    
+    async def _fill(self, key: tuple, situation: Situation, generate) -> None:
+        try:
+            pool = self._pools.setdefault(key, deque())
+            while len(pool) < self.size:
+                pool.append(await generate(situation))
+        except Exception as e:
+            print(f"Error refilling opening messages for situation {situation.id}: {e}")
+        finally:
+            self._refilling.discard(key)
+    
+    def stop(self) -> None:
+        """Cancel pending refills (call on shutdown)"""
+        for task in list(self._tasks):
+            task.cancel()
+    
+    def stats(self) -> Dict[str, int]:
+        return {
+            'situations': len(self._pools),
+            'pooled': sum(len(pool) for pool in self._pools.values()),
+            'hits': self.hits,
+            'misses': self.misses
+        }
+
+opening_pool = OpeningMessagePool(size=settings.OPENING_POOL_SIZE, low_water=settings.OPENING_POOL_LOW_WATER)
+
+# Keyword groups used by the rule-based persona engine
+KEYWORD_GROUPS = {
+    'career_technical': frozenset(['python', 'javascript', 'code', 'programming', 'development', 'technical']),
+    'career_experience': frozenset(['experience', 'background', 'worked', 'project']),
+    'career_teamwork': frozenset(['team', 'collaboration', 'colleagues', 'work with']),
+    'customer_calming': frozenset(['understand', 'appreciate', 'thank', 'help']),
+    'customer_refund': frozenset(['refund', 'money back', 'return']),
+    'customer_escalation': frozenset(['manager', 'supervisor', 'boss']),
+    'social_interests': frozenset(['hobby', 'hobbies', 'interests', 'like to do', 'enjoy']),
+    'social_work': frozenset(['work', 'job', 'career', 'profession']),
+    'social_travel': frozenset(['travel', 'vacation', 'trip', 'visit']),
+    'management_receptive': frozenset(['understand', 'appreciate', 'help', 'improve']),
+    'management_feedback': frozenset(['feedback', 'performance', 'improve', 'better']),
+    'networking_business': frozenset(['business', 'company', 'work', 'industry', 'professional']),
+    'networking_collaboration': frozenset(['collaborate', 'partner', 'work together', 'opportunity']),
+    'positive': frozenset(['good', 'great', 'excellent', 'love', 'like', 'appreciate', 'thank', 'understand', 'agree']),
+    'negative': frozenset(['bad', 'terrible', 'hate', 'angry', 'frustrated', 'upset', 'problem', 'issue', 'complaint'])
+}
+
+# Topic keywords in reporting order: tech, business, then hobbies
+TOPIC_KEYWORDS = (
+    'python', 'javascript', 'react', 'node', 'database', 'api', 'frontend', 'backend',
+    'marketing', 'sales', 'strategy', 'management', 'leadership', 'consulting',
+    'photography', 'hiking', 'reading', 'music', 'travel', 'sports', 'cooking'
+)
+
+# Every keyword above, matched in a single pass per message
+persona_keywords = KeywordMatcher(
+    [keyword for group in KEYWORD_GROUPS.values() for keyword in sorted(group)] + list(TOPIC_KEYWORDS)
+)
+
+# Keywords the rule-based feedback looks for in the user's messages
+FEEDBACK_KEYWORDS = frozenset(['thank', 'experience', 'project', 'team', 'collaboration', 'understand', 'help', 'solution', 'resolve'])
+feedback_keywords = KeywordMatcher(sorted(FEEDBACK_KEYWORDS | KEYWORD_GROUPS['positive'] | KEYWORD_GROUPS['negative']))
+
+class ConversationStats:
+    """Running totals over a session's messages, updated one message at a time
+
+    Holds everything the session-end feedback needs from the transcript: user
+    message and word counts, questions, long answers, feedback keyword hits,
+    sentiment tallies and the pre-rendered transcript lines.
+    """
+
+    LONG_MESSAGE_WORDS = 20
+
+    def __init__(self):
+        self.next_order = 0
+        self.last_message_id: Optional[str] = None
+        self.user_messages = 0
+        self.user_words = 0
+        self.questions = 0
+        self.long_messages = 0
+        self.keyword_hits: set = set()
+        self.sentiment = {'positive': 0, 'negative': 0, 'neutral': 0}
+        self.transcript_lines: List[str] = []
+        self.weight = 256
+
+    @classmethod
+    def from_messages(cls, messages: List[DialogueMessage]) -> 'ConversationStats':
+        stats = cls()
+        for msg in messages:
+            stats.add(msg)
+        return stats
+
+    def add(self, message: DialogueMessage) -> None:
+        speaker = "USER" if message.message_type == "user" else "AI PERSONA"
+        line = f"[{message.timestamp.strftime('%H:%M:%S')}] {speaker}: {message.content}"
+        self.transcript_lines.append(line)
+        self.weight += 64 + len(line)
+        self.next_order = message.message_order + 1
+        self.last_message_id = str(message.id)
+        if message.message_type != 'user':
+            return
+
+        text = message.content.lower()
+        words = len(text.split())
+        hits = feedback_keywords.find(text)
+        self.user_messages += 1
+        self.user_words += words
+        self.questions += '?' in text
+        self.long_messages += words > self.LONG_MESSAGE_WORDS
+        self.keyword_hits |= hits & FEEDBACK_KEYWORDS
+        # Same rule as AIPersonaService._analyze_sentiment
+        positive = len(hits & KEYWORD_GROUPS['positive'])
+        negative = len(hits & KEYWORD_GROUPS['negative'])
+        self.sentiment['positive' if positive > negative else 'negative' if negative > positive else 'neutral'] += 1
+
+    @property
+    def avg_user_words(self) -> float:
+        return self.user_words / max(self.user_messages, 1)
+
+    def used_any(self, *keywords: str) -> bool:
+        return not self.keyword_hits.isdisjoint(keywords)
+
+class ConversationStatsTracker:
+    """Per-session ConversationStats, kept current by MessageService
+
+    An entry is started by the message with order 0 and extended by each message
+    written after it; an order gap (a write this worker did not see) drops the
+    entry. for_session() only trusts an entry that matches the transcript it is
+    given and otherwise rebuilds it in one pass.
+    """
+
+    def __init__(self, max_bytes: int):
+        self._cache = SizedLRUCache(max_weight=max_bytes, weigher=lambda stats: stats.weight)
+
+    def record(self, session_id: str, message: DialogueMessage) -> None:
+        if message.message_order == 0:
+            stats = ConversationStats()
+        else:
+            stats = self._cache.get(session_id)
+            if stats is None:
+                return
+            if message.message_order != stats.next_order:
+                self._cache.pop(session_id)
+                return
+        stats.add(message)
+        self._cache.set(session_id, stats, weight=stats.weight)
+
+    def for_session(self, session: SessionWithMessages) -> ConversationStats:
+        session_id = str(session.id)
+        stats = self._cache.get(session_id)
+        messages = session.messages
+        if (stats is not None and len(messages) == stats.next_order
+                and (not messages or str(messages[-1].id) == stats.last_message_id)):
+            return stats
+        stats = ConversationStats.from_messages(messages)
+        self._cache.set(session_id, stats, weight=stats.weight)
+        return stats
+
+    def evict(self, session_id: str) -> None:
+        self._cache.pop(session_id)
+
+    def stats(self) -> Dict[str, int]:
+        return self._cache.stats()
+
+conversation_stats = ConversationStatsTracker(max_bytes=settings.CONVERSATION_STATS_MAX_BYTES)
+
 class AIPersonaService:
     """AI Persona Service with OpenAI GPT integration"""
     
     def __init__(self):
-        # Initialize OpenAI client
-        self.client = openai.OpenAI(api_key=settings.OPENAI_API_KEY)
+        # OpenAI calls go through the shared async client in llm.py
         self.openai_ready = True  # OpenAI integration is now active
-        print("✅ OpenAI integration activated with GPT-4o-mini")
+        print("✅ OpenAI integration activated with GPT-4o-mini"
+              + (f" via {settings.OPENAI_BASE_URL}" if settings.OPENAI_BASE_URL else ""))
         
         # Detailed conversation starters by scenario
         self.conversation_starters = {
@@ -450,25 +1100,47 @@ class AIPersonaService:
             print(f"Error generating AI response: {e}")
             return "I understand. Please continue."
     
+    async def generate_opening_message(self, situation: Situation) -> str:
+        """Take a pre-generated opening message, or a mock starter while the pool is empty"""
+        opener = opening_pool.take(situation, self._generate_opener) if self.openai_ready else None
+        return opener or await self._generate_mock_response(situation, [])
+    
+    def refill_openers(self, situation: Situation) -> None:
+        """Top up the situation's opening-message pool in the background"""
+        if self.openai_ready:
+            opening_pool.refill(situation, self._generate_opener)
+    
+    async def _generate_opener(self, situation: Situation) -> str:
+        """Generate one opening message for the pool; raises instead of falling back"""
+        response = await chat_completion(
+            priority=PRIORITY_BATCH,
+            model=settings.OPENAI_MODEL,
+            messages=self._build_conversation_context(situation, []),
+            max_tokens=settings.OPENAI_MAX_TOKENS,
+            temperature=settings.OPENAI_TEMPERATURE,
+            presence_penalty=0.6,
+            frequency_penalty=0.3
+        )
+        opener = (response.choices[0].message.content or "").strip()
+        if len(opener) < 10:
+            raise ValueError(f"Opening message too short: '{opener}'")
+        return opener[:497] + "..." if len(opener) > 500 else opener
+    
     async def _generate_openai_response(self, situation: Situation, conversation_history: List[DialogueMessage]) -> str:
         """Generate authentic AI persona response using OpenAI GPT"""
         try:
             # Build conversation context with persona instructions
             messages = self._build_conversation_context(situation, conversation_history)
             
-            # Call OpenAI API asynchronously
-            loop = asyncio.get_event_loop()
-            response = await loop.run_in_executor(
-                None,
-                lambda: self.client.chat.completions.create(
-                    model=settings.OPENAI_MODEL,
-                    messages=messages,
-                    max_tokens=settings.OPENAI_MAX_TOKENS,
-                    temperature=settings.OPENAI_TEMPERATURE,
-                    presence_penalty=0.6,  # Encourage varied responses
-                    frequency_penalty=0.3   # Reduce repetitive phrases
-                )
-            )
+            # Call OpenAI API asynchronously; a slow call is abandoned for the local engine
+            response = await asyncio.wait_for(chat_completion(
+                model=settings.OPENAI_MODEL,
+                messages=messages,
+                max_tokens=settings.OPENAI_MAX_TOKENS,
+                temperature=settings.OPENAI_TEMPERATURE,
+                presence_penalty=0.6,  # Encourage varied responses
+                frequency_penalty=0.3   # Reduce repetitive phrases
+            ), timeout=settings.OPENAI_HEDGE_SECONDS)
             
             ai_response = response.choices[0].message.content.strip()
             
@@ -484,9 +1156,14 @@ class AIPersonaService:
             print(f"✅ Generated OpenAI response for {situation.category} scenario: {ai_response[:50]}...")
             return ai_response
             
-        except openai.RateLimitError as e:
-            print(f"OpenAI rate limit exceeded: {e}")
-            return "I need a moment to think. Could you please rephrase that or try again in a moment?"
+        except asyncio.TimeoutError:
+            print(f"OpenAI response slower than {settings.OPENAI_HEDGE_SECONDS}s, using local engine")
+            return await self._generate_mock_response(situation, conversation_history)
+            
+        except LLMUnavailableError as e:
+            # Breaker open, or rate limits outlasted the deadline
+            print(f"OpenAI unavailable ({e}), using local engine")
+            return await self._generate_mock_response(situation, conversation_history)
             
         except openai.APIError as e:
             print(f"OpenAI API error: {e}")
@@ -496,6 +1173,64 @@ class AIPersonaService:
             print(f"Unexpected error with OpenAI: {e}")
             return await self._generate_mock_response(situation, conversation_history)
     
+    async def generate_response_stream(self, situation: Situation, conversation_history: List[DialogueMessage]) -> AsyncIterator[str]:
+        """Stream the AI persona response as text chunks, falling back to a mock reply if nothing arrives
+        
+        Raises if the stream fails after the first chunk was yielded.
+        """
+        sent = 0
+        if self.openai_ready:
+            stream = stream_chat_completion(
+                model=settings.OPENAI_MODEL,
+                messages=self._build_conversation_context(situation, conversation_history),
+                max_tokens=settings.OPENAI_MAX_TOKENS,
+                temperature=settings.OPENAI_TEMPERATURE,
+                presence_penalty=0.6,
+                frequency_penalty=0.3
+            )
+            try:
+                # Give up on OpenAI if the first token is slower than the hedge
+                first_delta = await asyncio.wait_for(stream.__anext__(), timeout=settings.OPENAI_HEDGE_SECONDS)
+                # Same rule as the non-streaming path: a stripped reply over 500 characters is
+                # cut to 497 plus "...". The first 497 go out as they arrive; the rest is held
+                # back until the reply either ends or turns out to be too long
+                text = ""
+                truncated = False
+                async for delta in self._prepend(first_delta, stream):
+                    text += delta if text else delta.lstrip()
+                    if len(text.rstrip()) > 500:
+                        yield text[sent:497] + "..."
+                        sent = 500
+                        truncated = True
+                        break
+                    if sent < min(len(text), 497):
+                        yield text[sent:497]
+                        sent = min(len(text), 497)
+                if not truncated and len(text) > sent:
+                    yield text[sent:]
+                    sent = len(text)
+            except StopAsyncIteration:
+                pass
+            except asyncio.TimeoutError:
+                print(f"OpenAI first token slower than {settings.OPENAI_HEDGE_SECONDS}s, using local engine")
+            except Exception as e:
+                print(f"Error streaming OpenAI response: {e}")
+                if sent:
+                    # Part of the reply is already out; a cut-off reply must not be saved as complete
+                    raise
+            finally:
+                # Frees the concurrency slot right away when we stop early
+                await stream.aclose()
+        
+        if sent == 0:
+            yield await self._generate_mock_response(situation, conversation_history)
+    
+    @staticmethod
+    async def _prepend(first: str, stream: AsyncIterator[str]) -> AsyncIterator[str]:
+        yield first
+        async for delta in stream:
+            yield delta
+    
     async def _generate_mock_response(self, situation: Situation, conversation_history: List[DialogueMessage]) -> str:
         """Enhanced mock response generation"""
         # If this is the first message, use conversation starter
@@ -519,37 +1254,37 @@ class AIPersonaService:
     
     def _generate_enhanced_contextual_response(self, situation: Situation, user_message: str, message_count: int) -> str:
         """Enhanced contextual response generation with better conversation flow"""
-        user_lower = user_message.lower()
         category = situation.category
         
-        # Extract keywords and topics from user message
-        topics = self._extract_topics(user_message)
-        sentiment = self._analyze_sentiment(user_message)
+        # Find every keyword in one pass, then derive topics and sentiment from the hits
+        hits = persona_keywords.find(user_message.lower())
+        topics = self._extract_topics(user_message, hits)
+        sentiment = self._analyze_sentiment(user_message, hits)
         
         # Career/Interview scenarios
         if category == 'career':
-            return self._generate_career_response(user_message, user_lower, message_count, topics, sentiment)
+            return self._generate_career_response(user_message, hits, message_count, topics, sentiment)
         
         # Customer Service scenarios
         elif category == 'customer_service':
-            return self._generate_customer_service_response(user_message, user_lower, message_count, sentiment)
+            return self._generate_customer_service_response(user_message, hits, message_count, sentiment)
         
         # Social scenarios
         elif category == 'social':
-            return self._generate_social_response(user_message, user_lower, message_count, topics)
+            return self._generate_social_response(user_message, hits, message_count, topics)
         
         # Management scenarios
         elif category == 'management':
-            return self._generate_management_response(user_message, user_lower, message_count, sentiment)
+            return self._generate_management_response(user_message, hits, message_count, sentiment)
         
         # Networking scenarios
         elif category == 'networking':
-            return self._generate_networking_response(user_message, user_lower, message_count, topics)
+            return self._generate_networking_response(user_message, hits, message_count, topics)
         
         # Default fallback
         return self._get_default_response(user_message, message_count)
     
-    def _generate_career_response(self, user_message: str, user_lower: str, message_count: int, topics: list, sentiment: str) -> str:
+    def _generate_career_response(self, user_message: str, hits: set, message_count: int, topics: list, sentiment: str) -> str:
         """Generate career/interview specific responses"""
         patterns = self.response_patterns.get('career', {})
         
@@ -562,7 +1297,7 @@ class AIPersonaService:
             ])
         
         # Technical discussion
-        if any(tech in user_lower for tech in ['python', 'javascript', 'code', 'programming', 'development', 'technical']):
+        if hits & KEYWORD_GROUPS['career_technical']:
             return random.choice([
                 "Excellent! How do you approach debugging when you encounter a complex issue in your code?",
                 "That's great experience. Can you walk me through your process for learning new technologies?",
@@ -570,13 +1305,13 @@ class AIPersonaService:
             ])
         
         # Experience and background
-        if any(word in user_lower for word in ['experience', 'background', 'worked', 'project']):
+        if hits & KEYWORD_GROUPS['career_experience']:
             return random.choice(patterns.get('questions', [
                 "That's impressive experience. Can you give me a specific example of a challenging project you completed?"
             ]))
         
         # Teamwork and collaboration
-        if any(word in user_lower for word in ['team', 'collaboration', 'colleagues', 'work with']):
+        if hits & KEYWORD_GROUPS['career_teamwork']:
             return random.choice([
                 "Teamwork is crucial here. Tell me about a time when you had to resolve a conflict with a team member.",
                 "Great! How do you handle situations where team members have different approaches to solving a problem?",
@@ -590,26 +1325,26 @@ class AIPersonaService:
             "I can see you have strong problem-solving skills. What would you do differently next time?"
         ]))
     
-    def _generate_customer_service_response(self, user_message: str, user_lower: str, message_count: int, sentiment: str) -> str:
+    def _generate_customer_service_response(self, user_message: str, hits: set, message_count: int, sentiment: str) -> str:
         """Generate customer service specific responses"""
         patterns = self.response_patterns.get('customer_service', {})
         
         # Positive sentiment - customer is calming down
-        if sentiment == 'positive' or any(word in user_lower for word in ['understand', 'appreciate', 'thank', 'help']):
+        if sentiment == 'positive' or hits & KEYWORD_GROUPS['customer_calming']:
             return random.choice(patterns.get('de_escalations', [
                 "Thank you for being patient with me. I was just really frustrated about this situation.",
                 "I appreciate you taking the time to explain that. What are my options here?"
             ]))
         
         # Negative sentiment - customer is still upset
-        elif any(word in user_lower for word in ['refund', 'money back', 'return']):
+        elif hits & KEYWORD_GROUPS['customer_refund']:
             return random.choice([
                 "Finally! Yes, I want a full refund. I don't care about your 30-day policy - this is defective!",
                 "That's what I've been asking for! How long will the refund process take?"
             ])
         
         # Manager escalation
-        elif any(word in user_lower for word in ['manager', 'supervisor', 'boss']):
+        elif hits & KEYWORD_GROUPS['customer_escalation']:
             return random.choice([
                 "Yes, I think speaking to a manager would be appropriate. This situation needs to be escalated.",
                 "Thank you, I would appreciate speaking with someone who has more authority to resolve this."
@@ -621,17 +1356,17 @@ class AIPersonaService:
             "I appreciate that, but this has been going on for weeks now. What are you going to do to make this right?"
         ]))
     
-    def _generate_social_response(self, user_message: str, user_lower: str, message_count: int, topics: list) -> str:
+    def _generate_social_response(self, user_message: str, hits: set, message_count: int, topics: list) -> str:
         """Generate social conversation responses"""
         patterns = self.response_patterns.get('social', {})
         
         # Respond to interests and hobbies
-        if any(word in user_lower for word in ['hobby', 'hobbies', 'interests', 'like to do', 'enjoy']):
+        if hits & KEYWORD_GROUPS['social_interests']:
             topic = topics[0] if topics else "that"
             return random.choice(patterns.get('interests', [])).replace('{topic}', topic).replace('{related_place}', 'the local area').replace('{alternative_interest}', 'reading')
         
         # Work and career discussion
-        if any(word in user_lower for word in ['work', 'job', 'career', 'profession']):
+        if hits & KEYWORD_GROUPS['social_work']:
             return random.choice([
                 "That sounds like rewarding work! What's the most interesting part of your job?",
                 "That's fascinating! How did you get started in that field?",
@@ -639,7 +1374,7 @@ class AIPersonaService:
             ])
         
         # Travel and experiences
-        if any(word in user_lower for word in ['travel', 'vacation', 'trip', 'visit']):
+        if hits & KEYWORD_GROUPS['social_travel']:
             return random.choice([
                 "Oh, I love traveling! What's your favorite place you've visited recently?",
                 "That sounds amazing! I'm always looking for new travel ideas. Any recommendations?",
@@ -653,19 +1388,19 @@ class AIPersonaService:
             "What's been the highlight of your week so far?"
         ]))
     
-    def _generate_management_response(self, user_message: str, user_lower: str, message_count: int, sentiment: str) -> str:
+    def _generate_management_response(self, user_message: str, hits: set, message_count: int, sentiment: str) -> str:
         """Generate management/feedback conversation responses"""
         patterns = self.response_patterns.get('management', {})
         
         # Positive/receptive responses
-        if sentiment == 'positive' or any(word in user_lower for word in ['understand', 'appreciate', 'help', 'improve']):
+        if sentiment == 'positive' or hits & KEYWORD_GROUPS['management_receptive']:
             return random.choice(patterns.get('receptive', [
                 "You're right, I can definitely work on that. Do you have any specific suggestions?",
                 "I appreciate the feedback. It's helpful to get your perspective on this."
             ]))
         
         # Feedback and performance discussion
-        elif any(word in user_lower for word in ['feedback', 'performance', 'improve', 'better']):
+        elif hits & KEYWORD_GROUPS['management_feedback']:
             return random.choice([
                 "I really do want to get better. Maybe I just need some guidance on prioritizing tasks?",
                 "That makes sense. I want to improve, so I'm glad you brought this up.",
@@ -678,17 +1413,17 @@ class AIPersonaService:
             "I guess I didn't realize it was coming across that way. That wasn't my intention."
         ]))
     
-    def _generate_networking_response(self, user_message: str, user_lower: str, message_count: int, topics: list) -> str:
+    def _generate_networking_response(self, user_message: str, hits: set, message_count: int, topics: list) -> str:
         """Generate networking conversation responses"""
         patterns = self.response_patterns.get('networking', {})
         
         # Business and professional topics
-        if any(word in user_lower for word in ['business', 'company', 'work', 'industry', 'professional']):
+        if hits & KEYWORD_GROUPS['networking_business']:
             field = topics[0] if topics else "your field"
             return random.choice(patterns.get('professional', [])).replace('{field}', field).replace('{topic}', field)
         
         # Collaboration opportunities
-        if any(word in user_lower for word in ['collaborate', 'partner', 'work together', 'opportunity']):
+        if hits & KEYWORD_GROUPS['networking_collaboration']:
             return random.choice(patterns.get('collaborative', [
                 "That's exactly the kind of expertise our clients are looking for. Would you be open to a coffee meeting sometime?",
                 "I think there could be some real opportunities for collaboration between our companies."
@@ -701,30 +1436,22 @@ class AIPersonaService:
             "This has been a great conversation! What brings you to networking events like this?"
         ])
     
-    def _extract_topics(self, message: str) -> list:
+    def _extract_topics(self, message: str, hits: Optional[set] = None) -> list:
         """Extract key topics from user message"""
         # Simple keyword extraction - can be enhanced later
-        tech_keywords = ['python', 'javascript', 'react', 'node', 'database', 'api', 'frontend', 'backend']
-        business_keywords = ['marketing', 'sales', 'strategy', 'management', 'leadership', 'consulting']
-        hobby_keywords = ['photography', 'hiking', 'reading', 'music', 'travel', 'sports', 'cooking']
-        
-        topics = []
-        message_lower = message.lower()
-        
-        for keyword in tech_keywords + business_keywords + hobby_keywords:
-            if keyword in message_lower:
-                topics.append(keyword)
+        if hits is None:
+            hits = persona_keywords.find(message.lower())
         
+        topics = [keyword for keyword in TOPIC_KEYWORDS if keyword in hits]
         return topics[:3]  # Return top 3 topics
     
-    def _analyze_sentiment(self, message: str) -> str:
+    def _analyze_sentiment(self, message: str, hits: Optional[set] = None) -> str:
         """Simple sentiment analysis"""
-        positive_words = ['good', 'great', 'excellent', 'love', 'like', 'appreciate', 'thank', 'understand', 'agree']
-        negative_words = ['bad', 'terrible', 'hate', 'angry', 'frustrated', 'upset', 'problem', 'issue', 'complaint']
+        if hits is None:
+            hits = persona_keywords.find(message.lower())
         
-        message_lower = message.lower()
-        positive_count = sum(1 for word in positive_words if word in message_lower)
-        negative_count = sum(1 for word in negative_words if word in message_lower)
+        positive_count = len(hits & KEYWORD_GROUPS['positive'])
+        negative_count = len(hits & KEYWORD_GROUPS['negative'])
         
         if positive_count > negative_count:
             return 'positive'
@@ -750,30 +1477,22 @@ class AIPersonaService:
         # Create detailed system prompt based on scenario category
         system_prompt = self._create_system_prompt(situation)
         
-        messages = [{"role": "system", "content": system_prompt}]
-        
-        # Add conversation history with proper role mapping
-        for msg in conversation_history:
-            role = "user" if msg.message_type == "user" else "assistant"
-            messages.append({
-                "role": role,
-                "content": msg.content
-            })
-        
-        return messages
+        # Recent history verbatim, older turns as a running summary, within the token budget
+        return conversation_context.build(system_prompt, conversation_history)
     
     def _create_system_prompt(self, situation: Situation) -> str:
-        """Create detailed system prompt for authentic persona responses"""
+        """Get the compiled system prompt for a situation"""
+        return system_prompt_cache.get(situation, self._compile_system_prompt)
+    
+    def _compile_system_prompt(self, situation: Situation) -> str:
+        """Create detailed system prompt for authentic persona responses
         
-        base_instructions = f"""You are roleplaying in an interactive conversation training scenario. Here are your character details:
-
-PERSONA SCRIPT: {situation.persona_script}
-
-SCENARIO DETAILS:
-- Title: {situation.title}  
-- Description: {situation.description}
-- Difficulty Level: {situation.difficulty_level}
-- Category: {situation.category}
+        Laid out most-shared first - generic instructions, then the category block,
+        then the situation's details - so the prefix is identical across users and
+        situations and provider-side prompt caching can apply.
+        """
+        
+        base_instructions = """You are roleplaying in an interactive conversation training scenario. Your character details are given at the end of these instructions.
 
 CRITICAL ROLEPLAY INSTRUCTIONS:
 1. STAY IN CHARACTER at all times - you ARE this persona, not an AI assistant
@@ -782,60 +1501,7 @@ CRITICAL ROLEPLAY INSTRUCTIONS:
 4. React authentically to what the user says
 5. Keep responses conversational and realistic (50-150 words)
 6. DO NOT break character or mention that you're roleplaying
-7. DO NOT be overly helpful or AI-assistant-like"""
-
-        # Add scenario-specific instructions
-        if situation.category == 'career':
-            base_instructions += """
-
-CAREER SCENARIO INSTRUCTIONS:
-- Ask follow-up questions about experience and skills
-- Present realistic interview challenges
-- Show genuine interest in candidate responses
-- Maintain professional but approachable tone
-- Ask behavioral and technical questions naturally"""
-
-        elif situation.category == 'customer_service':
-            base_instructions += """
-
-CUSTOMER SERVICE SCENARIO INSTRUCTIONS:
-- Express genuine frustration about the problem
-- Vary your emotional state based on agent responses
-- Be willing to escalate or de-escalate naturally
-- Show appreciation when agent provides good solutions
-- Remain human and realistic in your complaints"""
-
-        elif situation.category == 'social':
-            base_instructions += """
-
-SOCIAL SCENARIO INSTRUCTIONS:
-- Be genuinely interested in getting to know the person
-- Share personal anecdotes and ask engaging questions
-- Show enthusiasm about shared interests
-- Maintain a friendly, warm conversational tone
-- React naturally to awkward or smooth moments"""
-
-        elif situation.category == 'management':
-            base_instructions += """
-
-MANAGEMENT SCENARIO INSTRUCTIONS:
-- Show realistic employee emotions (nervousness, defensiveness, etc.)
-- Be receptive to constructive feedback when delivered well
-- Express concerns and ask clarifying questions
-- Demonstrate willingness to improve when supported properly
-- React authentically to different management approaches"""
-
-        elif situation.category == 'networking':
-            base_instructions += """
-
-NETWORKING SCENARIO INSTRUCTIONS:
-- Show genuine professional interest in others
-- Share relevant business experiences and insights
-- Look for collaboration opportunities naturally
-- Maintain professional enthusiasm
-- Exchange ideas and explore mutual benefits"""
-
-        base_instructions += """
+7. DO NOT be overly helpful or AI-assistant-like
 
 RESPONSE GUIDELINES:
 - Keep responses between 20-150 words
@@ -845,17 +1511,35 @@ RESPONSE GUIDELINES:
 - Match the energy and tone of the conversation
 - Avoid being overly formal unless the character demands it"""
 
+        # Add scenario-specific instructions
+        base_instructions += CATEGORY_PROMPT_INSTRUCTIONS.get(situation.category, "")
+
+        base_instructions += f"""
+
+PERSONA SCRIPT: {situation.persona_script}
+
+SCENARIO DETAILS:
+- Title: {situation.title}  
+- Description: {situation.description}
+- Difficulty Level: {situation.difficulty_level}
+- Category: {situation.category}"""
+
         return base_instructions
 
+class FeedbackInProgressError(Exception):
+    """Another job holds the session's feedback claim"""
+
 class FeedbackService:
     """Service for generating enhanced session feedback using OpenAI"""
     
     def __init__(self):
-        self.supabase = get_supabase_client()
-        self.openai_client = openai.OpenAI(api_key=settings.OPENAI_API_KEY)
+        self.db = get_async_db()
     
     async def generate_session_feedback(self, session_id: str) -> Optional[SessionSummary]:
-        """Generate comprehensive AI-powered feedback for a completed session"""
+        """Generate comprehensive AI-powered feedback for a completed session
+        
+        Returns None on failure; raises FeedbackInProgressError if another job is generating it.
+        """
         try:
             # Get session with messages
             session_service = SessionService()
@@ -865,42 +1549,104 @@ class FeedbackService:
                 print(f"No session data or messages found for session {session_id}")
                 return None
             
-            # Generate enhanced feedback using OpenAI
-            try:
-                feedback = await self._generate_ai_feedback(session_data)
-                print(f"✅ Generated AI feedback for session {session_id}")
-            except Exception as ai_error:
-                print(f"AI feedback generation failed, using traditional analysis: {ai_error}")
-                feedback = self._analyze_conversation(session_data)
+            if session_data.summary:
+                return session_data.summary
             
-            # Save feedback to database
-            feedback_data = {
-                'session_id': session_id,
-                'performance_score': feedback['score'],
-                'feedback_text': feedback['overview'],
-                'strengths': feedback['strengths'],
-                'improvement_areas': feedback['improvements'],
-                'key_insights': feedback['insights']
-            }
+            # Only the job that claims the session pays for the LLM call
+            if not await self._claim(session_id):
+                raise FeedbackInProgressError(f"Feedback for session {session_id} is already being generated")
             
-            response = self.supabase.table('session_summaries').insert(feedback_data).execute()
+            try:
+                # Generate enhanced feedback using OpenAI
+                feedback = await self.score_session(session_data)
+                
+                # Save feedback to database (fills in the claim row)
+                feedback_data = self.summary_fields(feedback)
+                
+                response = await self.db.table('session_summaries').update(feedback_data).eq('session_id', session_id).execute()
+            except BaseException:
+                await self._release(session_id)
+                raise
+            
+            transcript_cache.evict(session_id)
+            conversation_stats.evict(session_id)
             if response and response.data and len(response.data) > 0:
                 return SessionSummary(**response.data[0])
             
             print(f"Failed to save feedback to database for session {session_id}")
             return None
             
+        except FeedbackInProgressError:
+            raise
         except Exception as e:
             print(f"Error generating feedback: {e}")
             import traceback
             traceback.print_exc()
             return None
     
-    async def _generate_ai_feedback(self, session_data: SessionWithMessages) -> Dict[str, Any]:
+    async def score_session(self, session_data: SessionWithMessages, priority: int = PRIORITY_FEEDBACK,
+                            fallback: bool = True) -> Dict[str, Any]:
+        """Feedback for a transcript without saving it; uses the rule-based analysis if the AI call fails and `fallback` is set"""
+        try:
+            feedback = await self._generate_ai_feedback(session_data, priority)
+            print(f"✅ Generated AI feedback for session {session_data.id}")
+            return feedback
+        except Exception as ai_error:
+            if not fallback:
+                raise
+            print(f"AI feedback generation failed, using traditional analysis: {ai_error}")
+            return self._analyze_conversation(session_data)
+    
+    @staticmethod
+    def summary_fields(feedback: Dict[str, Any]) -> Dict[str, Any]:
+        """session_summaries columns for a feedback dict"""
+        return {
+            'performance_score': feedback['score'],
+            'feedback_text': feedback['overview'],
+            'strengths': feedback['strengths'],
+            'improvement_areas': feedback['improvements'],
+            'key_insights': feedback['insights']
+        }
+    
+    async def _claim(self, session_id: str) -> bool:
+        """Insert the session's summary row without a score; UNIQUE(session_id) lets only one caller win"""
+        for _ in range(2):
+            try:
+                await self.db.table('session_summaries').insert({'session_id': session_id}).execute()
+                return True
+            except Exception as e:
+                if getattr(e, 'code', None) != '23505':
+                    raise
+            # Take over a claim left behind by a worker that died mid-job
+            cutoff = (datetime.now(timezone.utc) - timedelta(seconds=settings.FEEDBACK_CLAIM_TIMEOUT_SECONDS)).isoformat()
+            stale = await self.db.table('session_summaries').delete().eq('session_id', session_id).is_('performance_score', 'null').lt('created_at', cutoff).execute()
+            if not stale or not stale.data:
+                return False
+        return False
+    
+    async def _release(self, session_id: str) -> None:
+        """Drop an unfinished claim so a retry can generate the feedback"""
+        try:
+            await self.db.table('session_summaries').delete().eq('session_id', session_id).is_('performance_score', 'null').execute()
+        except Exception as e:
+            print(f"Error releasing feedback claim for session {session_id}: {e}")
+    
+    async def _generate_ai_feedback(self, session_data: SessionWithMessages, priority: int = PRIORITY_FEEDBACK) -> Dict[str, Any]:
         """Generate sophisticated feedback using OpenAI analysis"""
         
         # Build conversation transcript for analysis
         transcript = self._build_transcript(session_data)
+        stats = conversation_stats.for_session(session_data)
+        
+        if ConversationContextManager.estimate_tokens(transcript) > settings.FEEDBACK_MAP_REDUCE_THRESHOLD_TOKENS:
+            # Long sessions: analyze transcript windows concurrently, then merge their notes below
+            notes = await self._analyze_transcript_windows(session_data, stats.transcript_lines, priority)
+            parts = "\n\n".join(f"Part {i}: {note}" for i, note in enumerate(notes, 1))
+            transcript_section = (
+                f"SEGMENT ANALYSES ({len(notes)} consecutive parts of a {len(session_data.messages)}-message conversation):\n{parts}"
+            )
+        else:
+            transcript_section = f"FULL CONVERSATION TRANSCRIPT:\n{transcript}"
         
         # Create feedback analysis prompt
         feedback_prompt = f"""You are an expert communication coach analyzing a roleplay conversation.
@@ -910,8 +1656,9 @@ ROLEPLAY SCENARIO:
 - Category: {session_data.situation.category} 
 - Description: {session_data.situation.description}
 
-FULL CONVERSATION TRANSCRIPT:
-{transcript}
+{transcript_section}
+
+USER MESSAGE STATS: {stats.user_messages} messages, {stats.avg_user_words:.0f} words on average, {stats.questions} with questions; tone {stats.sentiment['positive']} positive / {stats.sentiment['negative']} negative / {stats.sentiment['neutral']} neutral
 
 Analyze the USER's communication performance specifically for this {session_data.situation.category} scenario.
 Focus on engagement level, communication style, and effectiveness.
@@ -931,15 +1678,12 @@ KEY INSIGHTS: [2-3 key learning points for future development, separated by ' 
 Focus on practical, actionable feedback that helps improve communication skills. Be constructive but direct - this is for skill development."""
 
         # Call OpenAI for feedback analysis
-        loop = asyncio.get_event_loop()
-        response = await loop.run_in_executor(
-            None,
-            lambda: self.openai_client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[{"role": "user", "content": feedback_prompt}],
-                max_tokens=400,
-                temperature=0.3  # Lower temperature for more consistent feedback
-            )
+        response = await chat_completion(
+            priority=priority,
+            model=settings.OPENAI_FEEDBACK_MODEL,
+            messages=[{"role": "user", "content": feedback_prompt}],
+            max_tokens=400,
+            temperature=0.3  # Lower temperature for more consistent feedback
         )
         
         feedback_text = response.choices[0].message.content.strip()
@@ -947,19 +1691,60 @@ Focus on practical, actionable feedback that helps improve communication skills.
         # Parse the structured feedback
         return self._parse_ai_feedback(feedback_text, session_data)
     
+    async def _analyze_transcript_windows(self, session_data: SessionWithMessages, lines: List[str],
+                                          priority: int = PRIORITY_FEEDBACK) -> List[str]:
+        """Map step of chunked feedback: notes on each transcript window, at most FEEDBACK_CHUNK_CONCURRENCY calls at a time"""
+        windows = [[]]
+        budget = settings.FEEDBACK_CHUNK_TOKENS
+        for line in lines:
+            cost = ConversationContextManager.estimate_tokens(line)
+            if windows[-1] and cost > budget:
+                windows.append([])
+                budget = settings.FEEDBACK_CHUNK_TOKENS
+            windows[-1].append(line)
+            budget -= cost
+        
+        semaphore = asyncio.Semaphore(settings.FEEDBACK_CHUNK_CONCURRENCY)
+        
+        async def analyze(index: int, window: List[str]) -> str:
+            segment = "\n".join(window)
+            prompt = f"""You are an expert communication coach reviewing one segment of a longer roleplay conversation.
+
+ROLEPLAY SCENARIO: {session_data.situation.title} ({session_data.situation.category})
+
+TRANSCRIPT SEGMENT {index} OF {len(windows)}:
+{segment}
+
+In under 100 words, note how the USER communicated in this segment: specific strengths, weaknesses, and notable moments. Output only the notes."""
+            async with semaphore:
+                response = await chat_completion(
+                    priority=priority,
+                    model=settings.OPENAI_FEEDBACK_MODEL,
+                    messages=[{"role": "user", "content": prompt}],
+                    max_tokens=settings.FEEDBACK_CHUNK_NOTES_MAX_TOKENS,
+                    temperature=0.3
+                )
+            return response.choices[0].message.content.strip()
+        
+        results = await asyncio.gather(
+            *(analyze(i, window) for i, window in enumerate(windows, 1)), return_exceptions=True
+        )
+        failures = [result for result in results if isinstance(result, BaseException)]
+        if len(failures) == len(results):
+            raise failures[0]
+        if failures:
+            print(f"{len(failures)} of {len(results)} transcript segments could not be analyzed: {failures[0]}")
+        return [result if isinstance(result, str) else "(segment unavailable)" for result in results]
+    
     def _build_transcript(self, session_data: SessionWithMessages) -> str:
         """Build a clean conversation transcript for analysis"""
-        transcript_lines = []
-        
-        transcript_lines.append(f"=== ROLEPLAY CONVERSATION ({len(session_data.messages)} messages) ===")
-        transcript_lines.append(f"Scenario: {session_data.situation.title}")
-        
-        for i, msg in enumerate(session_data.messages, 1):
-            speaker = "USER" if msg.message_type == "user" else "AI PERSONA"
-            timestamp = msg.timestamp.strftime('%H:%M:%S')
-            transcript_lines.append(f"[{timestamp}] {speaker}: {msg.content}")
-        
-        return "\n".join(transcript_lines)
+        # Message lines are rendered as the messages arrive (see ConversationStats)
+        stats = conversation_stats.for_session(session_data)
+        header = [
+            f"=== ROLEPLAY CONVERSATION ({len(session_data.messages)} messages) ===",
+            f"Scenario: {session_data.situation.title}"
+        ]
+        return "\n".join(header + stats.transcript_lines)
     
     def _parse_ai_feedback(self, feedback_text: str, session_data: SessionWithMessages) -> Dict[str, Any]:
         """Parse structured feedback from OpenAI response"""
@@ -1019,8 +1804,7 @@ Focus on practical, actionable feedback that helps improve communication skills.
                 overview = f"Your {session_data.situation.category} conversation demonstrated good engagement with room for improvement in specific areas."
             
             if not strengths:
-                user_messages = [msg for msg in session_data.messages if msg.message_type == 'user']
-                avg_length = sum(len(msg.content.split()) for msg in user_messages) / max(len(user_messages), 1)
+                avg_length = conversation_stats.for_session(session_data).avg_user_words
                 strengths = f"Maintained consistent communication throughout the session • Average response length of {avg_length:.0f} words shows good detail"
             
             if not improvements:
@@ -1044,11 +1828,11 @@ Focus on practical, actionable feedback that helps improve communication skills.
     
     def _analyze_conversation(self, session_data: SessionWithMessages) -> Dict[str, Any]:
         """Analyze conversation and generate feedback"""
-        user_messages = [msg for msg in session_data.messages if msg.message_type == 'user']
-        total_messages = len(user_messages)
+        stats = conversation_stats.for_session(session_data)
+        total_messages = stats.user_messages
         
         # Calculate basic metrics
-        avg_message_length = sum(len(msg.content.split()) for msg in user_messages) / max(total_messages, 1)
+        avg_message_length = stats.avg_user_words
         
         # Determine performance score based on engagement and message quality
         score = min(85, max(60, int(70 + (total_messages * 2) + (avg_message_length * 0.5))))
@@ -1060,8 +1844,8 @@ Focus on practical, actionable feedback that helps improve communication skills.
         feedback = {
             'score': score,
             'overview': self._generate_overview_feedback(category, total_messages, avg_message_length),
-            'strengths': self._generate_strengths_feedback(category, user_messages),
-            'improvements': self._generate_improvement_feedback(category, user_messages),
+            'strengths': self._generate_strengths_feedback(category, stats),
+            'improvements': self._generate_improvement_feedback(category, stats),
             'insights': self._generate_insights_feedback(category, situation_title, total_messages)
         }
         
@@ -1082,46 +1866,43 @@ Focus on practical, actionable feedback that helps improve communication skills.
         
         return feedback_templates.get(category, f"You showed {engagement_level} engagement in this roleplay scenario with {detail_level} responses.")
     
-    def _generate_strengths_feedback(self, category: str, user_messages: List[DialogueMessage]) -> str:
+    def _generate_strengths_feedback(self, category: str, stats: ConversationStats) -> str:
         """Generate strengths feedback based on message analysis"""
-        message_texts = [msg.content.lower() for msg in user_messages]
-        
         strengths = []
         
         # Check for positive communication patterns
-        if any('thank' in text for text in message_texts):
+        if stats.used_any('thank'):
             strengths.append("Good use of polite expressions and gratitude")
         
-        if any(len(text.split()) > 20 for text in message_texts):
+        if stats.long_messages:
             strengths.append("Ability to provide detailed explanations when needed")
         
-        if any('?' in text for text in message_texts):
+        if stats.questions:
             strengths.append("Good questioning skills and curiosity")
         
         # Category-specific strengths
         if category == 'career':
-            if any('experience' in text or 'project' in text for text in message_texts):
+            if stats.used_any('experience', 'project'):
                 strengths.append("Effectively highlighted relevant experience")
-            if any('team' in text or 'collaboration' in text for text in message_texts):
+            if stats.used_any('team', 'collaboration'):
                 strengths.append("Demonstrated understanding of teamwork importance")
         
         elif category == 'customer_service':
-            if any('understand' in text or 'help' in text for text in message_texts):
+            if stats.used_any('understand', 'help'):
                 strengths.append("Showed empathy and willingness to help")
-            if any('solution' in text or 'resolve' in text for text in message_texts):
+            if stats.used_any('solution', 'resolve'):
                 strengths.append("Focused on problem-solving approaches")
         
         return " • ".join(strengths) if strengths else "Maintained consistent communication throughout the session"
     
-    def _generate_improvement_feedback(self, category: str, user_messages: List[DialogueMessage]) -> str:
+    def _generate_improvement_feedback(self, category: str, stats: ConversationStats) -> str:
         """Generate improvement suggestions"""
         improvements = []
         
-        if len(user_messages) < 5:
+        if stats.user_messages < 5:
             improvements.append("Try to engage more deeply by asking follow-up questions")
         
-        avg_length = sum(len(msg.content.split()) for msg in user_messages) / max(len(user_messages), 1)
-        if avg_length < 10:
+        if stats.avg_user_words < 10:
             improvements.append("Provide more detailed responses to show depth of thinking")
         
         # Category-specific improvements
@@ -1166,4 +1947,101 @@ Focus on practical, actionable feedback that helps improve communication skills.
         insights.append(category_insights.get(category, "Effective communication requires practice, patience, and genuine interest in others."))
         insights.append("Consider recording yourself practicing to identify speech patterns and areas for improvement.")
         
-        return " • ".join(insights)
\ No newline at end of file
+        return " • ".join(insights)
+
+class FeedbackJobQueue:
+    """Generates session feedback in the background with a bounded number of workers
+    
+    A session is queued at most once per process while its job is waiting or
+    running; across processes the claim in FeedbackService makes sure only one
+    job calls the LLM. A failed session is retried with exponential backoff and
+    given up on after `max_attempts` failures, so a client polling for the
+    feedback cannot start an unbounded number of paid attempts.
+    """
+    
+    def __init__(self, workers: int, max_attempts: int, retry_base_seconds: float):
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.retry_base_seconds = retry_base_seconds
+        self.completed = 0
+        self.failed = 0
+        self.in_progress_elsewhere = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._jobs = set()
+        self._running = 0
+        self._tasks: List[asyncio.Task] = []
+        # session_id -> (failed attempts, monotonic time before which no retry is queued)
+        self._failures = TTLCache(maxsize=10000, ttl=3600)
+    
+    def enqueue(self, session_id: str, generate) -> None:
+        """Queue `generate(session_id)` unless the session already has a job here or is backing off"""
+        if session_id in self._jobs:
+            return
+        attempts, retry_at = self._failures.get(session_id) or (0, 0.0)
+        if attempts >= self.max_attempts or time.monotonic() < retry_at:
+            return
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+            self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+        self._jobs.add(session_id)
+        self._queue.put_nowait((session_id, generate))
+    
+    def is_pending(self, session_id: str) -> bool:
+        return session_id in self._jobs
+    
+    def has_failed(self, session_id: str) -> bool:
+        """Whether the session used up its attempts; enqueue() ignores it from then on"""
+        attempts, _ = self._failures.get(session_id) or (0, 0.0)
+        return attempts >= self.max_attempts
+    
+    def _record_failure(self, session_id: str) -> None:
+        self.failed += 1
+        attempts, _ = self._failures.get(session_id) or (0, 0.0)
+        attempts += 1
+        self._failures.set(session_id, (attempts, time.monotonic() + self.retry_base_seconds * 2 ** (attempts - 1)))
+    
+    async def _work(self) -> None:
+        while True:
+            session_id, generate = await self._queue.get()
+            self._running += 1
+            try:
+                if await generate(session_id):
+                    self.completed += 1
+                    self._failures.pop(session_id)
+                else:
+                    self._record_failure(session_id)
+            except FeedbackInProgressError:
+                # The job holding the claim will save the feedback
+                self.in_progress_elsewhere += 1
+            except Exception as e:
+                self._record_failure(session_id)
+                print(f"Feedback job failed for session {session_id}: {e}")
+            finally:
+                self._running -= 1
+                self._jobs.discard(session_id)
+                self._queue.task_done()
+    
+    async def stop(self) -> None:
+        """Cancel the workers (call on shutdown); unfinished jobs release their claims"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+        self._jobs.clear()
+    
+    def stats(self) -> Dict[str, int]:
+        return {
+            'workers': self.workers,
+            'queued': len(self._jobs) - self._running,
+            'running': self._running,
+            'completed': self.completed,
+            'failed': self.failed,
+            'in_progress_elsewhere': self.in_progress_elsewhere
+        }
+
+feedback_jobs = FeedbackJobQueue(
+    workers=settings.FEEDBACK_WORKERS,
+    max_attempts=settings.FEEDBACK_MAX_ATTEMPTS,
+    retry_base_seconds=settings.FEEDBACK_RETRY_BASE_SECONDS
+)
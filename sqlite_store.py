@@ -0,0 +1,336 @@
+import glob
+import json
+import os
+import re
+import sqlite3
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Tuple, Union
+from postgrest import APIError, APIResponse
+from postgrest.base_request_builder import SingleAPIResponse
+
+SCHEMA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'supabase')
+
+# Postgres-only bits of supabase/tables/*.sql; everything else is valid SQLite as written
+_DDL_REWRITES = [
+    (re.compile(r'CREATE TABLE (?!IF NOT EXISTS)'), 'CREATE TABLE IF NOT EXISTS '),
+    (re.compile(r'\bUUID PRIMARY KEY DEFAULT gen_random_uuid\(\)'), 'TEXT PRIMARY KEY'),
+    (re.compile(r'\bSERIAL PRIMARY KEY'), 'INTEGER PRIMARY KEY AUTOINCREMENT'),
+    (re.compile(r'DEFAULT NOW\(\)'), "DEFAULT (strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now'))")
+]
+
+def _json_row(alias: str, columns: str, extra: str = '') -> str:
+    pairs = ', '.join(f"'{column}', {alias}.{column}" for column in columns.split())
+    return f"json_object({pairs}{extra})"
+
+_SITUATION_JSON = _json_row(
+    'sit', 'id title description persona_script difficulty_level category created_at',
+    ", 'is_active', json(CASE WHEN sit.is_active THEN 'true' ELSE 'false' END)"
+)
+
+# SQLite versions of supabase/views/*.sql (no row_to_json / json_agg / LATERAL)
+_VIEWS = {
+    'session_details': f"""
+        CREATE VIEW IF NOT EXISTS session_details AS
+        SELECT
+            s.id, s.user_id, s.situation_id, s.started_at, s.ended_at, s.status,
+            s.session_duration, s.next_message_order,
+            {_SITUATION_JSON} AS situation,
+            COALESCE((
+                SELECT json_group_array(json(m.row))
+                FROM (
+                    SELECT {_json_row('dm', 'id session_id message_type content timestamp message_order')} AS row
+                    FROM dialogue_messages dm
+                    WHERE dm.session_id = s.id
+                    ORDER BY dm.message_order
+                ) m
+            ), '[]') AS messages,
+            (
+                SELECT {_json_row('ss', 'id session_id performance_score feedback_text strengths improvement_areas key_insights created_at')}
+                FROM session_summaries ss
+                WHERE ss.session_id = s.id
+            ) AS summary
+        FROM roleplay_sessions s
+        JOIN situations sit ON sit.id = s.situation_id
+    """,
+    'session_overviews': f"""
+        CREATE VIEW IF NOT EXISTS session_overviews AS
+        SELECT
+            s.id, s.user_id, s.situation_id, s.started_at, s.ended_at, s.status,
+            s.session_duration,
+            {_SITUATION_JSON} AS situation,
+            (SELECT count(*) FROM dialogue_messages m WHERE m.session_id = s.id) AS message_count
+        FROM roleplay_sessions s
+        JOIN situations sit ON sit.id = s.situation_id
+    """
+}
+_JSON_COLUMNS = {
+    'session_details': ('situation', 'messages', 'summary'),
+    'session_overviews': ('situation',)
+}
+
+# Stored as ISO-8601 text, but the precision written here (milliseconds) differs from
+# what Python's isoformat() sends back in filters, so these compare as instants
+_TIMESTAMP_COLUMNS = frozenset(['created_at', 'started_at', 'ended_at', 'last_active', 'timestamp'])
+
+_IDENTIFIER = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+def _quote(name: str) -> str:
+    if not _IDENTIFIER.match(name):
+        raise ValueError(f"Invalid column name: {name!r}")
+    return f'"{name}"'
+
+class SQLiteQuery:
+    """One table request, built with the same chained calls as a PostgREST request"""
+
+    def __init__(self, store: 'SQLiteStore', table: str):
+        self._store = store
+        self._table = _quote(table)
+        self._name = table
+        self._action = 'select'
+        self._columns = '*'
+        self._rows: List[Dict[str, Any]] = []
+        self._filters: List[Tuple[str, Any]] = []
+        self._order: List[str] = []
+        self._limit: Optional[int] = None
+        self._single = False
+        self._on_conflict: Optional[str] = None
+        self._returning = True
+
+    def select(self, *columns: str, count: Optional[str] = None) -> 'SQLiteQuery':
+        names = [name.strip() for column in columns for name in column.split(',')]
+        if names and names != ['*']:
+            self._columns = ', '.join(_quote(name) for name in names)
+        return self
+
+    def insert(self, data: Union[Dict, List[Dict]], returning: str = 'representation') -> 'SQLiteQuery':
+        self._action = 'insert'
+        self._rows = data if isinstance(data, list) else [data]
+        self._returning = returning != 'minimal'
+        return self
+
+    def upsert(self, data: Union[Dict, List[Dict]], on_conflict: str = 'id',
+               returning: str = 'representation', **kwargs: Any) -> 'SQLiteQuery':
+        self.insert(data, returning)
+        self._on_conflict = on_conflict
+        return self
+
+    def update(self, data: Dict[str, Any]) -> 'SQLiteQuery':
+        self._action = 'update'
+        self._rows = [data]
+        return self
+
+    def delete(self) -> 'SQLiteQuery':
+        self._action = 'delete'
+        return self
+
+    def _compare(self, column: str, operator: str, value: Any) -> 'SQLiteQuery':
+        if column in _TIMESTAMP_COLUMNS and isinstance(value, str):
+            self._filters.append((f"julianday({_quote(column)}) {operator} julianday(?)", value))
+        else:
+            self._filters.append((f"{_quote(column)} {operator} ?", value))
+        return self
+
+    def eq(self, column: str, value: Any) -> 'SQLiteQuery':
+        return self._compare(column, '=', value)
+
+    def lt(self, column: str, value: Any) -> 'SQLiteQuery':
+        return self._compare(column, '<', value)
+
+    def gt(self, column: str, value: Any) -> 'SQLiteQuery':
+        return self._compare(column, '>', value)
+
+    def is_(self, column: str, value: Any) -> 'SQLiteQuery':
+        # PostgREST's is.null / is.true / is.false
+        literal = {'null': 'NULL', None: 'NULL', 'true': '1', True: '1', 'false': '0', False: '0'}[value]
+        self._filters.append((f"{_quote(column)} IS {literal}", None))
+        return self
+
+    def order(self, column: str, desc: bool = False) -> 'SQLiteQuery':
+        # PostgREST accepts 'a,b.desc,c'; a column without its own direction gets `desc`
+        for name in column.split(','):
+            name, _, direction = name.strip().partition('.')
+            direction = direction or ('desc' if desc else 'asc')
+            if direction not in ('asc', 'desc'):
+                raise ValueError(f"Invalid order direction: {direction!r}")
+            self._order.append(f"{_quote(name)} {direction.upper()}")
+        return self
+
+    def limit(self, size: int) -> 'SQLiteQuery':
+        self._limit = size
+        return self
+
+    def maybe_single(self) -> 'SQLiteQuery':
+        self._single = True
+        return self
+
+    def _where(self) -> Tuple[str, List[Any]]:
+        if not self._filters:
+            return '', []
+        return (' WHERE ' + ' AND '.join(clause for clause, _ in self._filters),
+                [value for clause, value in self._filters if '?' in clause])
+
+    def _statements(self) -> List[Tuple[str, List[Any]]]:
+        where, params = self._where()
+        if self._action == 'select':
+            sql = f"SELECT {self._columns} FROM {self._table}{where}"
+            if self._order:
+                sql += ' ORDER BY ' + ', '.join(self._order)
+            if self._limit is not None:
+                sql += f" LIMIT {int(self._limit)}"
+            return [(sql, params)]
+        if self._action == 'delete':
+            return [(f"DELETE FROM {self._table}{where} RETURNING *", params)]
+        if self._action == 'update':
+            values = self._rows[0]
+            assignments = ', '.join(f"{_quote(column)} = ?" for column in values)
+            return [(f"UPDATE {self._table} SET {assignments}{where} RETURNING *", list(values.values()) + params)]
+
+        statements = []
+        for row in self._rows:
+            # Stand-in for the column's DEFAULT gen_random_uuid(): it only applies when the
+            # row is inserted, so an upsert never rewrites an existing row's id with it
+            keep = {self._on_conflict}
+            if self._store.generates_id(self._name) and 'id' not in row:
+                row = {'id': str(uuid.uuid4()), **row}
+                keep.add('id')
+            columns = ', '.join(_quote(column) for column in row)
+            sql = f"INSERT INTO {self._table} ({columns}) VALUES ({', '.join('?' * len(row))})"
+            if self._on_conflict:
+                updates = ', '.join(f"{_quote(column)} = excluded.{_quote(column)}"
+                                    for column in row if column not in keep)
+                sql += f" ON CONFLICT ({_quote(self._on_conflict)}) DO " + (f"UPDATE SET {updates}" if updates else 'NOTHING')
+            statements.append((sql + ' RETURNING *', list(row.values())))
+        return statements
+
+    async def execute(self) -> Optional[APIResponse]:
+        rows = self._store.run(self._name, self._statements())
+        if self._single:
+            # Same contract as postgrest's maybe_single(): None when nothing matched
+            return SingleAPIResponse(data=rows[0], count=None) if rows else None
+        return APIResponse(data=rows if self._returning else [], count=None)
+
+class SQLiteCall:
+    """Awaitable result of SQLiteStore.rpc(), mirroring postgrest's rpc builder"""
+
+    def __init__(self, store: 'SQLiteStore', func: str, params: Dict[str, Any]):
+        self._store = store
+        self._func = func
+        self._params = params
+
+    async def execute(self) -> APIResponse:
+        return APIResponse(data=self._store.call(self._func, self._params), count=None)
+
+class SQLiteStore:
+    """Embedded storage backend with the PostgREST client interface the services use
+
+    Tables come from supabase/tables/*.sql (with the few Postgres-only defaults
+    rewritten), the views and functions are SQLite equivalents of supabase/views
+    and supabase/functions, and an empty situations table is filled from
+    supabase/seed/situations.sql. Queries run synchronously on one connection;
+    each call is a few tens of microseconds, far below a PostgREST round trip.
+    Pass ':memory:' for a throwaway database.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._db = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA busy_timeout = 5000")
+        if path != ':memory:':
+            self._db.execute("PRAGMA journal_mode = WAL")
+            self._db.execute("PRAGMA synchronous = NORMAL")
+        self._uuid_tables = set()
+        self._boolean_columns: Dict[str, Tuple[str, ...]] = {}
+        self.create_schema()
+
+    def create_schema(self) -> None:
+        """Create the tables, indexes and views if missing and seed the situations"""
+        for path in sorted(glob.glob(os.path.join(SCHEMA_DIR, 'tables', '*.sql'))):
+            with open(path) as f:
+                ddl = f.read()
+            table = re.search(r'CREATE TABLE (\w+)', ddl).group(1)
+            if re.search(r'\bid UUID PRIMARY KEY', ddl):
+                self._uuid_tables.add(table)
+            self._boolean_columns[table] = tuple(re.findall(r'^\s*(\w+) BOOLEAN', ddl, re.MULTILINE))
+            for pattern, replacement in _DDL_REWRITES:
+                ddl = pattern.sub(replacement, ddl)
+            self._db.executescript(ddl)
+        for view in _VIEWS.values():
+            self._db.execute(view)
+        if self._db.execute("SELECT count(*) FROM situations").fetchone()[0] == 0:
+            with open(os.path.join(SCHEMA_DIR, 'seed', 'situations.sql')) as f:
+                self._db.executescript(f.read())
+
+    def generates_id(self, table: str) -> bool:
+        return table in self._uuid_tables
+
+    def table(self, name: str) -> SQLiteQuery:
+        return SQLiteQuery(self, name)
+
+    async def rpc(self, func: str, params: Dict[str, Any]) -> SQLiteCall:
+        return SQLiteCall(self, func, params)
+
+    @contextmanager
+    def _transaction(self):
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            raise
+        self._db.execute("COMMIT")
+
+    def _decode(self, table: str, row: sqlite3.Row) -> Dict[str, Any]:
+        data = dict(row)
+        for column in self._boolean_columns.get(table, ()):
+            if data.get(column) is not None:
+                data[column] = bool(data[column])
+        for column in _JSON_COLUMNS.get(table, ()):
+            if data.get(column) is not None:
+                data[column] = json.loads(data[column])
+        return data
+
+    def run(self, table: str, statements: List[Tuple[str, List[Any]]]) -> List[Dict[str, Any]]:
+        """Execute a request's statements atomically and return the affected or selected rows"""
+        try:
+            if len(statements) == 1:
+                sql, params = statements[0]
+                return [self._decode(table, row) for row in self._db.execute(sql, params).fetchall()]
+            rows = []
+            with self._transaction():
+                for sql, params in statements:
+                    rows.extend(self._decode(table, row) for row in self._db.execute(sql, params).fetchall())
+            return rows
+        except sqlite3.IntegrityError as e:
+            # Surface constraint violations the way PostgREST does
+            raise APIError({'message': str(e), 'code': '23505' if 'UNIQUE' in str(e) else '23502',
+                            'hint': None, 'details': None}) from e
+
+    def call(self, func: str, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Run one of the supabase/functions procedures"""
+        if func == 'append_dialogue_message':
+            bump = "UPDATE roleplay_sessions SET next_message_order = next_message_order + 1 WHERE id = ? RETURNING next_message_order - 1"
+            message_type = params['p_message_type']
+        elif func == 'append_opening_message':
+            # Only while the session is still empty, so at most one opener is inserted
+            bump = "UPDATE roleplay_sessions SET next_message_order = 1 WHERE id = ? AND next_message_order = 0 RETURNING 0"
+            message_type = 'persona'
+        else:
+            raise APIError({'message': f"Could not find the function public.{func}", 'code': 'PGRST202',
+                            'hint': None, 'details': None})
+
+        session_id = params['p_session_id']
+        with self._transaction():
+            order = self._db.execute(bump, (session_id,)).fetchone()
+            if order is None:
+                return []
+            row = self._db.execute(
+                "INSERT INTO dialogue_messages (id, session_id, message_type, content, message_order, timestamp) "
+                "VALUES (?, ?, ?, ?, ?, strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now')) RETURNING *",
+                (str(uuid.uuid4()), session_id, message_type, params['p_content'], order[0])
+            ).fetchone()
+        return [self._decode('dialogue_messages', row)]
+
+    async def aclose(self) -> None:
+        self._db.close()
@@ -0,0 +1,31 @@
+-- Existing deployments: add the per-session counter and seed it from the transcript
+ALTER TABLE roleplay_sessions ADD COLUMN IF NOT EXISTS next_message_order INTEGER NOT NULL DEFAULT 0;
+
+UPDATE roleplay_sessions s
+SET next_message_order = (
+    SELECT COALESCE(MAX(m.message_order) + 1, 0)
+    FROM dialogue_messages m
+    WHERE m.session_id = s.id
+);
+
+-- Append a message and assign its order in one statement. The UPDATE takes the
+-- session row lock, so concurrent appends to the same session are serialized
+-- and the cost does not depend on the transcript length.
+CREATE OR REPLACE FUNCTION append_dialogue_message(
+    p_session_id UUID,
+    p_message_type VARCHAR,
+    p_content TEXT
+) RETURNS SETOF dialogue_messages
+LANGUAGE sql
+AS $$
+    WITH next_order AS (
+        UPDATE roleplay_sessions
+        SET next_message_order = next_message_order + 1
+        WHERE id = p_session_id
+        RETURNING next_message_order - 1 AS message_order
+    )
+    INSERT INTO dialogue_messages (session_id, message_type, content, message_order, timestamp)
+    SELECT p_session_id, p_message_type, p_content, message_order, NOW()
+    FROM next_order
+    RETURNING *;
+$$;
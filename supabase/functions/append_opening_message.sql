@@ -0,0 +1,21 @@
+-- Insert the persona's opening message only while the session is still empty.
+-- The counter check and bump happen in one UPDATE under the session row lock,
+-- so concurrent or repeated calls (page reloads, several workers) insert at
+-- most one opener; the losers get an empty result.
+CREATE OR REPLACE FUNCTION append_opening_message(
+    p_session_id UUID,
+    p_content TEXT
+) RETURNS SETOF dialogue_messages
+LANGUAGE sql
+AS $$
+    WITH next_order AS (
+        UPDATE roleplay_sessions
+        SET next_message_order = 1
+        WHERE id = p_session_id AND next_message_order = 0
+        RETURNING 0 AS message_order
+    )
+    INSERT INTO dialogue_messages (session_id, message_type, content, message_order, timestamp)
+    SELECT p_session_id, 'persona', p_content, message_order, NOW()
+    FROM next_order
+    RETURNING *;
+$$;
@@ -5,4 +5,6 @@ CREATE TABLE dialogue_messages (
     content TEXT NOT NULL,
     timestamp TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
     message_order INTEGER NOT NULL
-);
\ No newline at end of file
+);
+
+CREATE INDEX IF NOT EXISTS idx_dialogue_messages_session_order ON dialogue_messages (session_id, message_order);
\ No newline at end of file
@@ -5,5 +5,8 @@ CREATE TABLE roleplay_sessions (
     started_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
     ended_at TIMESTAMP WITH TIME ZONE,
     status VARCHAR(50) DEFAULT 'active',
-    session_duration INTEGER DEFAULT 0
-);
\ No newline at end of file
+    session_duration INTEGER DEFAULT 0,
+    next_message_order INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE INDEX IF NOT EXISTS idx_roleplay_sessions_user_started ON roleplay_sessions (user_id, started_at DESC, id DESC);
\ No newline at end of file
@@ -0,0 +1,25 @@
+-- A session with its situation, ordered transcript and summary in one row, so
+-- the chat, feedback and review pages load a session in a single round trip.
+CREATE OR REPLACE VIEW session_details AS
+SELECT
+    s.id,
+    s.user_id,
+    s.situation_id,
+    s.started_at,
+    s.ended_at,
+    s.status,
+    s.session_duration,
+    s.next_message_order,
+    row_to_json(sit) AS situation,
+    COALESCE((
+        SELECT json_agg(m ORDER BY m.message_order)
+        FROM dialogue_messages m
+        WHERE m.session_id = s.id
+    ), '[]'::JSON) AS messages,
+    (
+        SELECT row_to_json(ss)
+        FROM session_summaries ss
+        WHERE ss.session_id = s.id
+    ) AS summary
+FROM roleplay_sessions s
+JOIN situations sit ON sit.id = s.situation_id;
@@ -0,0 +1,21 @@
+-- One row per session with its situation embedded and the message count
+-- aggregated, so the history page is a single query regardless of how many
+-- sessions a user has. Paginate with a keyset on (started_at, id).
+CREATE OR REPLACE VIEW session_overviews AS
+SELECT
+    s.id,
+    s.user_id,
+    s.situation_id,
+    s.started_at,
+    s.ended_at,
+    s.status,
+    s.session_duration,
+    row_to_json(sit) AS situation,
+    COALESCE(mc.message_count, 0) AS message_count
+FROM roleplay_sessions s
+JOIN situations sit ON sit.id = s.situation_id
+LEFT JOIN LATERAL (
+    SELECT count(*)::INTEGER AS message_count
+    FROM dialogue_messages m
+    WHERE m.session_id = s.id
+) mc ON TRUE;